@@ -0,0 +1,91 @@
+import argparse
+import os
+import sys
+from typing import TextIO
+
+from context.context_stack import DEFAULT_RECURSION_LIMIT
+from grading.grader import GradeReport, Grader, add_grader_arguments, add_results_argument, open_results, \
+    write_jsonl
+from profiling.sampler import Sampler, add_sampler_arguments, sampler_from_arguments, write_samples
+
+
+def submissions(path: str) -> list[str]:
+    # A directory grades every python file in it, anything else is a manifest with one submission path per line
+    if os.path.isdir(path):
+        return sorted(os.path.join(path, n) for n in os.listdir(path) if n.endswith(".py"))
+    with open(path, "r") as file:
+        lines = [line.strip() for line in file]
+    base = os.path.dirname(path)
+    return [os.path.join(base, line) for line in lines if line and not line.startswith("#")]
+
+
+def grade_all(grader: Grader, files: list[str], results_file: TextIO | None = None):
+    for f in files:
+        report = GradeReport(f, [])
+        try:
+            for r in grader.run_tests(f):
+                report.results.append(r)
+                if results_file is not None:
+                    write_jsonl(results_file, f, r)
+        except Exception as e:
+            # A submission that does not parse or crashes at module level fails every test, the batch carries on
+            report = GradeReport(f, [], e)
+            if results_file is not None:
+                write_jsonl(results_file, f, None, e)
+        yield report
+
+
+def print_report(report: GradeReport, total: int):
+    if report.error is not None:
+        print(f"{report.submission}: Error: {report.error}")
+    else:
+        print(f"{report.submission}: {report.passed}/{total} Passed, {report.timed_out} Timed Out")
+
+
+def main(test_file: str, submissions_path: str, cache_dir: str | None = None, engine: str = "tree",
+         recursion_limit: int = DEFAULT_RECURSION_LIMIT, fuel: int | None = None, memory_limit: int | None = None,
+         results_jsonl: str | None = None, results_dir: str | None = None, dedupe: bool = False,
+         rename_locals: bool = False, sampler: Sampler | None = None):
+    grader = Grader(test_file, cache_dir, engine, recursion_limit, fuel, memory_limit, results_dir, dedupe,
+                    rename_locals)
+    if sampler is not None:
+        grader.sampler = sampler
+        sampler.start()
+    results_file = open_results(results_jsonl)
+    quiet = results_file is sys.stdout
+    total = len(grader.test_names)
+    graded = 0
+    errors = 0
+    try:
+        for report in grade_all(grader, submissions(submissions_path), results_file):
+            graded += 1
+            errors += report.error is not None
+            if not quiet:
+                print_report(report, total)
+    finally:
+        if sampler is not None:
+            sampler.stop()
+        if results_file is not None and not quiet:
+            results_file.close()
+
+    if quiet:
+        return
+    print("Submissions Graded: " + str(graded))
+    print("Submissions Errored: " + str(errors))
+    print("Exiting...")
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(
+        usage="python3 batch.py <Path to test file> <Path to submissions directory or manifest>")
+    arg_parser.add_argument("test_file")
+    arg_parser.add_argument("submissions")
+    add_grader_arguments(arg_parser)
+    add_results_argument(arg_parser)
+    add_sampler_arguments(arg_parser)
+    args = arg_parser.parse_args()
+    sampler = sampler_from_arguments(args)
+    main(args.test_file, args.submissions, args.cache_dir, args.engine, args.recursion_limit, args.fuel,
+         args.memory_limit, args.results_jsonl, args.results_dir, args.dedupe, args.rename_locals, sampler)
+    if sampler is not None:
+        write_samples(sampler, args)
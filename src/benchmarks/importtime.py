@@ -0,0 +1,68 @@
+# Reports how long importing each entry point takes, using the interpreter's own -X importtime output.
+# Fails when an entry point imports a module it should load lazily or takes longer than the allowed time.
+import argparse
+import os
+import subprocess
+import sys
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY_POINTS = ["main", "batch", "parallel", "server", "client"]
+
+# Only needed once something is parsed, importing them at startup is a regression
+LAZY_MODULES = ["antlr4", "generated", "tree.tree"]
+
+
+class ImportTime:
+
+    def __init__(self, module: str, self_us: int, cumulative_us: int):
+        self.module = module
+        self.self_us = self_us
+        self.cumulative_us = cumulative_us
+
+
+def measure(entry_point: str) -> list[ImportTime]:
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {entry_point}"], cwd=SRC_DIR,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"Importing '{entry_point}' failed:\n" + result.stderr)
+    times = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        times.append(ImportTime(module.strip(), int(self_us), int(cumulative_us)))
+    return times
+
+
+def lazy_imports(times: list[ImportTime]) -> list[str]:
+    return [t.module for t in times if any(t.module == m or t.module.startswith(m + ".") for m in LAZY_MODULES)]
+
+
+def main(entry_points: list[str], top: int, max_ms: float | None) -> bool:
+    ok = True
+    for entry_point in entry_points:
+        times = measure(entry_point)
+        total_ms = next(t.cumulative_us for t in times if t.module == entry_point) / 1000
+        print(f"{entry_point}: {total_ms:.1f} ms")
+        for t in sorted(times, key=lambda t: t.cumulative_us, reverse=True)[:top]:
+            print(f"    {t.cumulative_us / 1000:>8.1f} ms {t.self_us / 1000:>8.1f} ms  {t.module}")
+        if lazy := lazy_imports(times):
+            print(f"    imports lazily loaded modules: {', '.join(lazy)}")
+            ok = False
+        if max_ms is not None and total_ms > max_ms:
+            print(f"    takes longer than {max_ms} ms")
+            ok = False
+    return ok
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(usage="python3 benchmarks/importtime.py [entry points]")
+    arg_parser.add_argument("entry_points", nargs="*", default=ENTRY_POINTS)
+    arg_parser.add_argument("--top", type=int, default=10,
+                            help="number of slowest imports listed per entry point, by cumulative time")
+    arg_parser.add_argument("--max-ms", type=float, default=None,
+                            help="fail when importing an entry point takes longer than this")
+    args = arg_parser.parse_args()
+    sys.exit(0 if main(args.entry_points, args.top, args.max_ms) else 1)
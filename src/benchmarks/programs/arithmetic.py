@@ -0,0 +1,13 @@
+def chain(a):
+    return a + 1 - 2 + 3 - 4 + 5 - 6 + 7 - 8 + 9 - 10 + a - a + 11 - 12 + 13 - 14 + 15 - 16 + 17 - 18 + 19 - 20 + a
+
+
+def spread(depth, a):
+    # 2 ** depth calls to chain without deep recursion
+    if depth == 0:
+        return chain(a)
+    return spread(depth - 1, a) + spread(depth - 1, a + 1) - a
+
+
+def run():
+    return spread(12, 1)
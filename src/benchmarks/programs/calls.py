@@ -0,0 +1,28 @@
+def identity(a):
+    return a
+
+
+def increment(a):
+    return identity(a) + 1
+
+
+def decrement(a):
+    return identity(a) - 1
+
+
+def same(a):
+    return decrement(increment(a))
+
+
+def pick(a, b, first):
+    return identity(a) if first else identity(b)
+
+
+def spread(depth, a):
+    if depth == 0:
+        return same(pick(a, same(a), depth == 0))
+    return spread(depth - 1, same(a)) + spread(depth - 1, increment(a)) - same(a)
+
+
+def run():
+    return spread(12, 0)
@@ -0,0 +1,38 @@
+def classify(a, b, c):
+    if a == 0:
+        if b == 0:
+            if c == 0:
+                return 1
+            if c == 1:
+                return 2
+            return 3
+        if b == 1:
+            if c == 0:
+                return 4
+            if c == 1:
+                return 5
+            return 6
+        return 7
+    if a == 1:
+        if b == 0:
+            if not c == 0 and not c == 1:
+                return 8
+            return 9 if c == 0 else 10
+        if b == 1 or c == 1:
+            return 11
+        return 12
+    return 13 if b == 0 or c == 0 else 14
+
+
+def bit(depth):
+    return 0 if depth == 0 else 1 - bit(depth - 1)
+
+
+def spread(depth, a, b, c):
+    if depth == 0:
+        return classify(a, b, c)
+    return spread(depth - 1, bit(depth), b, c) + spread(depth - 1, a, bit(depth + 1), 1 - c)
+
+
+def run():
+    return spread(11, 0, 0, 0)
@@ -0,0 +1,159 @@
+# Times the interpreter on the programs in benchmarks/programs, reporting parse, syntax tree build and execution time
+# separately. Results can be saved as JSON and compared against a stored baseline to catch regressions.
+import argparse
+import copy
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIR)
+
+from context.context import Context
+from context.context_stack import ContextStack
+from grading.grader import ENGINES, build_syntax_tree, parse_tree
+from tree.optimizer import Optimizer
+from tree.resolver import Resolver
+from tree.statements import StatementList
+from value.bridge import Bridge
+
+PROGRAMS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "programs")
+
+# Every program defines run(), called once per execution after the module itself has run
+ENTRY_POINT = "run"
+
+# The large flat module is generated, functions are summed in groups to keep expressions and the stack shallow
+FLAT_FUNCTIONS = 400
+FLAT_GROUP = 20
+
+METRICS = ["parse", "build", "exec"]
+
+
+def flat_module(functions: int = FLAT_FUNCTIONS, group: int = FLAT_GROUP) -> str:
+    lines = []
+    for i in range(functions):
+        lines += [f"def f{i}(a):", f"    return a + {i} - 1", "", ""]
+    for g in range(functions // group):
+        lines += [f"def g{g}():", "    return " + " + ".join(f"f{i}(1)" for i in range(g * group, (g + 1) * group)),
+                  "", ""]
+    lines += ["def run():", "    return " + " + ".join(f"g{g}()" for g in range(functions // group))]
+    return "\n".join(lines) + "\n"
+
+
+def programs() -> dict[str, str]:
+    sources = {}
+    for n in sorted(os.listdir(PROGRAMS_DIR)):
+        if n.endswith(".py"):
+            with open(os.path.join(PROGRAMS_DIR, n), "r") as file:
+                sources[n[:-3]] = file.read()
+    sources["flat"] = flat_module()
+    return sources
+
+
+def execute(syntaxtree: StatementList, engine: str):
+    context = ContextStack([Context()])
+    ENGINES[engine](Resolver().resolve(Optimizer().optimize(syntaxtree)), context)
+    return Bridge(context).to_host(context.stack[0].defined_values[ENTRY_POINT])()
+
+
+def measure(action, warmup: int, repeat: int) -> float:
+    # Median of the timed runs, each action gets fresh input from its own setup so runs are independent
+    for _ in range(warmup):
+        action()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        action()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def benchmark(source: str, engines: list[str], warmup: int, repeat: int) -> dict[str, float]:
+    results = {"parse": measure(lambda: parse_tree(source), warmup, repeat)}
+    tree = parse_tree(source)
+    results["build"] = measure(lambda: build_syntax_tree(tree), warmup, repeat)
+
+    syntaxtree = build_syntax_tree(tree)
+    for engine in engines:
+        # Passes and engines change the tree they are given, so every run starts from a copy made outside the timing
+        copies = [copy.deepcopy(syntaxtree) for _ in range(warmup + repeat)]
+        results[f"exec.{engine}"] = measure(lambda: execute(copies.pop(), engine), warmup, repeat)
+    return results
+
+
+def compare(results: dict, baseline: dict, thresholds: dict[str, float], min_time: float) -> list[str]:
+    regressions = []
+    for program, metrics in results["programs"].items():
+        for metric, seconds in metrics.items():
+            if (base := baseline["programs"].get(program, {}).get(metric)) is None:
+                continue
+            # Times too short to measure reliably are skipped, they mostly compare noise
+            if max(base, seconds) < min_time:
+                continue
+            threshold = thresholds[metric.split(".")[0]]
+            change = seconds / base - 1
+            status = "REGRESSION" if change > threshold else "ok"
+            name = f"{program} {metric}"
+            print(f"{name:<32} {base * 1000:>10.3f} {seconds * 1000:>10.3f} {change:>+8.1%}  {status}")
+            if change > threshold:
+                regressions.append(name)
+    return regressions
+
+
+def main(names: list[str] | None, engines: list[str], warmup: int, repeat: int, output: str | None,
+         baseline_path: str | None, thresholds: dict[str, float], min_time: float) -> bool:
+    sources = programs()
+    results = {
+        "python": sys.version,
+        "platform": platform.platform(),
+        "warmup": warmup,
+        "repeat": repeat,
+        "programs": {},
+    }
+    for name, source in sources.items():
+        if names and name not in names:
+            continue
+        metrics = results["programs"][name] = benchmark(source, engines, warmup, repeat)
+        print(f"{name}: " + ", ".join(f"{m} {s * 1000:.3f} ms" for m, s in metrics.items()))
+
+    if output is not None:
+        with open(output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if baseline_path is None:
+        return True
+    with open(baseline_path, "r") as file:
+        baseline = json.load(file)
+    print()
+    print(f"{'Benchmark':<32} {'Base (ms)':>10} {'Now (ms)':>10} {'Change':>8}")
+    regressions = compare(results, baseline, thresholds, min_time)
+    if regressions:
+        print(f"{len(regressions)} regression(s): " + ", ".join(regressions))
+    return not regressions
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(usage="python3 benchmarks/run.py [programs]")
+    arg_parser.add_argument("programs", nargs="*", help="programs to run, all of them by default")
+    arg_parser.add_argument("--engines", nargs="+", choices=ENGINES.keys(), default=list(ENGINES.keys()),
+                            help="engines the programs are executed with")
+    arg_parser.add_argument("--warmup", type=int, default=1, help="untimed runs before the timed ones")
+    arg_parser.add_argument("--repeat", type=int, default=5, help="timed runs, the median is reported")
+    arg_parser.add_argument("--output", default=None, help="file the results are saved to as JSON")
+    arg_parser.add_argument("--baseline", default=None, help="JSON results of an earlier run to compare against")
+    arg_parser.add_argument("--threshold", type=float, default=0.10,
+                            help="relative slowdown reported as a regression, for every metric")
+    for metric in METRICS:
+        arg_parser.add_argument(f"--{metric}-threshold", type=float, default=None,
+                                help=f"relative slowdown reported as a regression for {metric} times")
+    arg_parser.add_argument("--min-time", type=float, default=0.001,
+                            help="seconds below which times are not compared")
+    args = arg_parser.parse_args()
+    thresholds = {m: args.threshold if getattr(args, f"{m}_threshold") is None else getattr(args, f"{m}_threshold")
+                  for m in METRICS}
+    ok = main(args.programs, args.engines, args.warmup, args.repeat, args.output, args.baseline, thresholds,
+              args.min_time)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,39 @@
+import hashlib
+import sys
+from typing import Callable
+
+from cache.disk_store import DiskStore
+from tree.statements import StatementList
+
+# Bump whenever the tree classes change shape so that stale entries are never loaded
+AST_FORMAT_VERSION = 4
+
+
+class AstCache:
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.entries = DiskStore(directory, ".ast")
+
+    def key(self, source: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"pyvte-ast-{AST_FORMAT_VERSION}-{sys.version}\0".encode())
+        digest.update(source.encode())
+        return digest.hexdigest()
+
+    def load(self, source: str) -> StatementList | None:
+        return self.entries.load(self.key(source))
+
+    def store(self, source: str, syntaxtree: StatementList):
+        self.entries.store(self.key(source), syntaxtree)
+
+    def get_or_parse(self, source: str, parse: Callable[[str], StatementList]) -> StatementList:
+        if (syntaxtree := self.load(source)) is not None:
+            return syntaxtree
+        syntaxtree = parse(source)
+        try:
+            self.store(source, syntaxtree)
+        except OSError:
+            # A read-only or full cache directory only costs the next run a parse, grading carries on uncached
+            pass
+        return syntaxtree
@@ -0,0 +1,48 @@
+# Small client for server.py, prints the same summary as main.py without loading the interpreter itself
+import argparse
+import json
+import os
+import socket
+from typing import Iterator
+
+
+def request(socket_path: str, test_file: str, file_to_test: str) -> Iterator[dict]:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        message = {"tests": os.path.abspath(test_file), "submission": os.path.abspath(file_to_test)}
+        connection.sendall(json.dumps(message).encode() + b"\n")
+        with connection.makefile("rb") as replies:
+            for line in replies:
+                reply = json.loads(line)
+                yield reply
+                if reply.get("done"):
+                    return
+    raise Exception("Grading server closed the connection")
+
+
+def main(socket_path: str, test_file: str, file_to_test: str):
+    for reply in request(socket_path, test_file, file_to_test):
+        if reply.get("done"):
+            if reply["error"] is not None:
+                print(f"Error: {reply['error']['type']}: {reply['error']['message']}")
+            print("Tests Run:    " + str(reply["passed"] + reply["failed"]))
+            print("Tests Passed: " + str(reply["passed"]))
+            print("Tests Failed: " + str(reply["failed"]))
+            print("Tests Timed Out: " + str(reply["timed_out"]))
+        elif reply["outcome"] == "timed out":
+            print(reply["test"] + ": Timed Out")
+        elif reply["outcome"] == "memory limit exceeded":
+            print(reply["test"] + ": Memory Limit Exceeded")
+        elif reply["outcome"] == "failed":
+            print(f"{reply['test']}: {reply['error']['type']}: {reply['error']['message']}")
+    print("Exiting...")
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(
+        usage="python3 client.py <Path to socket> <Path to test file> <Path to file to test>")
+    arg_parser.add_argument("socket")
+    arg_parser.add_argument("test_file")
+    arg_parser.add_argument("file_to_test")
+    args = arg_parser.parse_args()
+    main(args.socket, args.test_file, args.file_to_test)
@@ -1,16 +1,106 @@
-from typing import Any
+from itertools import count
+from types import MappingProxyType
+from typing import Any, Mapping
 
+# Shared by every frame that has no named locals, so such calls do not allocate a dict
+EMPTY_VALUES: Mapping[str, Any] = MappingProxyType({})
 
-class Context:
+# Versions are unique across all dicts, so an inline cache never mistakes one module for another
+_versions = count()
 
-    def __init__(self, defined_values: dict[str, Any] | None = None):
-        if defined_values is None:
-            defined_values = {}
-        self.defined_values = defined_values
 
+# Marks a key that was unbound when its old binding was journaled
+_UNBOUND = object()
+
+
+class VersionedValues(dict):
+    # Gets a new version on every mutation so inline caches can tell when a binding may have changed
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = next(_versions)
+        # Old bindings of every key changed since the first snapshot, as (key, value) pairs, or None when not needed
+        self.journal: list[tuple[Any, Any]] | None = None
+
+    def record(self, key):
+        if self.journal is not None:
+            self.journal.append((key, super().get(key, _UNBOUND)))
+
+    def __setitem__(self, key, value):
+        self.record(key)
+        super().__setitem__(key, value)
+        self.version = next(_versions)
+
+    def __delitem__(self, key):
+        self.record(key)
+        super().__delitem__(key)
+        self.version = next(_versions)
+
+    def pop(self, key, *args):
+        self.record(key)
+        self.version = next(_versions)
+        return super().pop(key, *args)
+
+    def popitem(self):
+        if self:
+            self.record(next(reversed(self)))
+        self.version = next(_versions)
+        return super().popitem()
 
-class ReturnValues(Context):
+    def setdefault(self, key, default=None):
+        self.record(key)
+        self.version = next(_versions)
+        return super().setdefault(key, default)
 
-    def __init__(self, value: Any):
-        super().__init__()
-        self.value = value
+    def update(self, *args, **kwargs):
+        # Materialized once, an iterator argument could not be read again after journaling its keys
+        items = dict(*args, **kwargs)
+        if self.journal is not None:
+            for k in items:
+                self.record(k)
+        super().update(items)
+        self.version = next(_versions)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def clear(self):
+        for k in self:
+            self.record(k)
+        super().clear()
+        self.version = next(_versions)
+
+    def snapshot(self) -> int:
+        # Copy-on-write: nothing is copied now, later mutations journal the binding they replace instead
+        if self.journal is None:
+            self.journal = []
+        return len(self.journal)
+
+    def restore(self, snapshot: int):
+        # Undoes every mutation made since the snapshot, in O(changes) rather than O(size)
+        journal = self.journal
+        if len(journal) == snapshot:
+            return
+        while len(journal) > snapshot:
+            key, value = journal.pop()
+            if value is _UNBOUND:
+                super().pop(key, None)
+            else:
+                super().__setitem__(key, value)
+        self.version = next(_versions)
+
+
+class Context:
+    __slots__ = ("defined_values", "slots", "return_value", "size", "definition")
+
+    def __init__(self, defined_values: dict[str, Any] | None = None, slots: list[Any] | None = None):
+        if defined_values is None:
+            defined_values = VersionedValues()
+        self.defined_values = defined_values
+        self.slots = slots
+        self.return_value = None
+        # Bytes charged to the memory limit for this frame, released again when it is left
+        self.size = 0
+        # FuncDefinition running in this frame, None for the module, read by the sampling profiler
+        self.definition = None
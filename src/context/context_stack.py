@@ -1,12 +1,32 @@
-from context.context import Context
+from typing import Any, Mapping
+
+from context.context import Context, EMPTY_VALUES
+from sandbox.errors import RecursionLimitExceeded, FuelExhausted, MemoryLimitExceeded
+from sandbox.memory import frame_size
+from value.value import NONE, Value
+
+# Frames are recycled through a free list instead of being allocated for every call
+FRAME_POOL_PREALLOCATED = 16
+FRAME_POOL_SIZE = 256
+
+# Maximum number of frames on the sandbox stack, independent of the host recursion limit
+DEFAULT_RECURSION_LIMIT = 10000
 
 
 class ContextStack:
 
-    def __init__(self, initial=None):
+    def __init__(self, initial=None, recursion_limit: int = DEFAULT_RECURSION_LIMIT, fuel: int | None = None,
+                 memory_limit: int | None = None):
         if initial is None:
             initial = []
         self.stack: list[Context] = initial
+        self.recursion_limit = recursion_limit
+        # Remaining work budget, charged one unit per call, or None when the run is unbounded
+        self.fuel = fuel
+        # Approximate bytes held by sandbox frames and the values bound in them, checked against memory_limit
+        self.memory_limit = memory_limit
+        self.memory_used = 0
+        self.free_frames: list[Context] = [Context(EMPTY_VALUES) for _ in range(FRAME_POOL_PREALLOCATED)]
 
     def push(self, new_context: Context):
         self.stack.append(new_context)
@@ -19,3 +39,37 @@ class ContextStack:
 
     def traverse(self):
         return reversed(self.stack)
+
+    def enter(self, defined_values: Mapping[str, Any], slots: list[Value], definition=None) -> Context:
+        if len(self.stack) >= self.recursion_limit:
+            raise RecursionLimitExceeded(self.recursion_limit)
+        if self.fuel is not None:
+            self.fuel -= 1
+            if self.fuel < 0:
+                raise FuelExhausted()
+        size = 0
+        if self.memory_limit is not None:
+            size = frame_size(slots)
+            if self.memory_used + size > self.memory_limit:
+                raise MemoryLimitExceeded(self.memory_limit)
+            self.memory_used += size
+        frame = self.free_frames.pop() if self.free_frames else Context(EMPTY_VALUES)
+        frame.size = size
+        frame.defined_values = defined_values
+        frame.slots = slots
+        frame.return_value = NONE
+        frame.definition = definition
+        self.stack.append(frame)
+        return frame
+
+    def leave(self) -> Value:
+        frame = self.stack.pop()
+        ret = frame.return_value
+        self.memory_used -= frame.size
+        frame.defined_values = EMPTY_VALUES
+        frame.slots = None
+        frame.return_value = None
+        frame.definition = None
+        if len(self.free_frames) < FRAME_POOL_SIZE:
+            self.free_frames.append(frame)
+        return ret
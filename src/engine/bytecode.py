@@ -0,0 +1,366 @@
+# Compiles syntax trees into a flat stack-based bytecode and runs it in a single dispatch loop.
+# Sandbox calls never recurse on the host: every frame lives on the VM's own heap-allocated stack.
+from array import array
+
+from context.context_stack import ContextStack
+from tree.definitions import FuncDefinition
+from tree.expression import Expression, TernaryExpression, OrExpression, AndExpression, NotExpression, \
+    AddExpression, SubtractExpression, ConstantExpression, TrueLiteral, FalseLiteral, NoneLiteral, Identifier, \
+    LocalIdentifier, GlobalIdentifier, NumericLiteral, EqComparison, CallExpression
+from tree.statements import Statement, StatementList, SimpleStatementList, IfStatement, ReturnStatement
+from value.value import Value, FUNC, INT, NONE, TRUE, FALSE, int_value
+
+# Every instruction is an (opcode, argument) pair of ints
+LOAD_CONST = 0
+LOAD_NAME = 1
+STORE_NAME = 2
+CALL = 3
+RETURN_VALUE = 4
+JUMP = 5
+POP_JUMP_IF_FALSE = 6
+POP_JUMP_IF_TRUE = 7
+BINARY_ADD = 8
+BINARY_SUBTRACT = 9
+COMPARE_EQ = 10
+UNARY_NOT = 11
+LOAD_FAST = 12
+LOAD_GLOBAL = 13
+# Binary operations whose right operand is a constant, with the constant's index as argument
+BINARY_ADD_CONST = 14
+BINARY_SUBTRACT_CONST = 15
+COMPARE_EQ_CONST = 16
+
+OPNAMES = ["LOAD_CONST", "LOAD_NAME", "STORE_NAME", "CALL", "RETURN_VALUE", "JUMP", "POP_JUMP_IF_FALSE",
+           "POP_JUMP_IF_TRUE", "BINARY_ADD", "BINARY_SUBTRACT", "COMPARE_EQ", "UNARY_NOT",
+           "LOAD_FAST", "LOAD_GLOBAL", "BINARY_ADD_CONST", "BINARY_SUBTRACT_CONST", "COMPARE_EQ_CONST"]
+
+
+class CodeObject:
+
+    def __init__(self, name: str, instructions: array, constants: list, names: list[str]):
+        self.name = name
+        self.instructions = instructions.tolist()
+        self.constants = constants
+        self.names = names
+        # Inline caches for LOAD_GLOBAL, indexed like names and valid while the module version is unchanged
+        self.global_versions = [-1] * len(names)
+        self.global_values: list = [None] * len(names)
+
+    def __str__(self):
+        lines = []
+        for pc in range(0, len(self.instructions), 2):
+            op, arg = self.instructions[pc], self.instructions[pc + 1]
+            if op in (LOAD_CONST, BINARY_ADD_CONST, BINARY_SUBTRACT_CONST, COMPARE_EQ_CONST):
+                detail = f" ({self.constants[arg]})"
+            elif op in (LOAD_NAME, STORE_NAME, LOAD_GLOBAL):
+                detail = f" ({self.names[arg]})"
+            else:
+                detail = ""
+            lines.append(f"{pc:>6} {OPNAMES[op]:<18} {arg}{detail}")
+        return f"Code '{self.name}':\n" + "\n".join(lines)
+
+
+class BytecodeFunction:
+
+    def __init__(self, definition: FuncDefinition, code: CodeObject):
+        self.definition = definition
+        self.name = definition.name
+        self.arguments = definition.arguments
+        self.code = code
+
+    def __str__(self):
+        return str(self.definition)
+
+    def call(self, context_stack: ContextStack, arguments: list[Value]) -> Value:
+        context_stack.enter(self.definition.frame_values(arguments), arguments, self.definition)
+        try:
+            ret = run_code(self.code, context_stack)
+        finally:
+            context_stack.leave()
+        return ret
+
+
+class BytecodeCompiler:
+
+    def __init__(self, name: str):
+        self.name = name
+        self.instructions = array("l")
+        self.constants: list = []
+        self.constant_indices: dict = {}
+        self.names: list[str] = []
+
+    def code_object(self) -> CodeObject:
+        return CodeObject(self.name, self.instructions, self.constants, self.names)
+
+    def emit(self, op: int, arg: int = 0) -> int:
+        self.instructions.append(op)
+        self.instructions.append(arg)
+        return len(self.instructions) - 2
+
+    def patch(self, at: int):
+        self.instructions[at + 1] = len(self.instructions)
+
+    def constant(self, value: Value) -> int:
+        key = id(value.val) if value.tag == FUNC else (value.tag, value.val)
+        if (index := self.constant_indices.get(key)) is None:
+            index = self.constant_indices[key] = len(self.constants)
+            self.constants.append(value)
+        return index
+
+    def name_index(self, name: str) -> int:
+        if name not in self.names:
+            self.names.append(name)
+        return self.names.index(name)
+
+    def compile_body(self, node: StatementList) -> CodeObject:
+        self.compile(node)
+        self.emit(LOAD_CONST, self.constant(NONE))
+        self.emit(RETURN_VALUE)
+        return self.code_object()
+
+    def compile(self, node: Statement | StatementList | Expression):
+        for cls in type(node).__mro__:
+            if method := getattr(self, "compile" + cls.__name__, None):
+                return method(node)
+        raise Exception(f"Cannot compile '{type(node).__name__}' yet")
+
+    def compileStatementList(self, node: StatementList):
+        for s in node.statements:
+            self.compile(s)
+
+    def compileSimpleStatementList(self, node: SimpleStatementList):
+        self.compileStatementList(node)
+
+    def compileIfStatement(self, node: IfStatement):
+        self.compile(node.condition)
+        jump = self.emit(POP_JUMP_IF_FALSE)
+        self.compile(node.code)
+        self.patch(jump)
+
+    def compileReturnStatement(self, node: ReturnStatement):
+        self.compile(node.expr)
+        self.emit(RETURN_VALUE)
+
+    def compileFuncDefinition(self, node: FuncDefinition):
+        code = BytecodeCompiler(node.name.name).compile_body(node.code)
+        self.emit(LOAD_CONST, self.constant(Value("func", BytecodeFunction(node, code))))
+        self.emit(STORE_NAME, self.name_index(node.name.name))
+
+    def compileTernaryExpression(self, node: TernaryExpression):
+        self.compile(node.condition)
+        to_rhs = self.emit(POP_JUMP_IF_FALSE)
+        self.compile(node.lhs)
+        to_end = self.emit(JUMP)
+        self.patch(to_rhs)
+        self.compile(node.rhs)
+        self.patch(to_end)
+
+    def compileOrExpression(self, node: OrExpression):
+        self.compile(node.lhs)
+        lhs_true = self.emit(POP_JUMP_IF_TRUE)
+        self.compile(node.rhs)
+        rhs_true = self.emit(POP_JUMP_IF_TRUE)
+        self.emit(LOAD_CONST, self.constant(FALSE))
+        to_end = self.emit(JUMP)
+        self.patch(lhs_true)
+        self.patch(rhs_true)
+        self.emit(LOAD_CONST, self.constant(TRUE))
+        self.patch(to_end)
+
+    def compileAndExpression(self, node: AndExpression):
+        self.compile(node.lhs)
+        lhs_false = self.emit(POP_JUMP_IF_FALSE)
+        self.compile(node.rhs)
+        rhs_false = self.emit(POP_JUMP_IF_FALSE)
+        self.emit(LOAD_CONST, self.constant(TRUE))
+        to_end = self.emit(JUMP)
+        self.patch(lhs_false)
+        self.patch(rhs_false)
+        self.emit(LOAD_CONST, self.constant(FALSE))
+        self.patch(to_end)
+
+    def compileNotExpression(self, node: NotExpression):
+        self.compile(node.operand)
+        self.emit(UNARY_NOT)
+
+    def compileBinary(self, node: AddExpression | SubtractExpression | EqComparison, op: int, const_op: int):
+        self.compile(node.lhs)
+        if isinstance(node.rhs, ConstantExpression):
+            # Saves dispatching a separate LOAD_CONST for the common `n - 1` and `n == 0`
+            self.emit(const_op, self.constant(node.rhs.value))
+        else:
+            self.compile(node.rhs)
+            self.emit(op)
+
+    def compileAddExpression(self, node: AddExpression):
+        self.compileBinary(node, BINARY_ADD, BINARY_ADD_CONST)
+
+    def compileSubtractExpression(self, node: SubtractExpression):
+        self.compileBinary(node, BINARY_SUBTRACT, BINARY_SUBTRACT_CONST)
+
+    def compileEqComparison(self, node: EqComparison):
+        self.compileBinary(node, COMPARE_EQ, COMPARE_EQ_CONST)
+
+    def compileConstantExpression(self, node: ConstantExpression):
+        self.emit(LOAD_CONST, self.constant(node.value))
+
+    def compileTrueLiteral(self, node: TrueLiteral):
+        self.emit(LOAD_CONST, self.constant(TRUE))
+
+    def compileFalseLiteral(self, node: FalseLiteral):
+        self.emit(LOAD_CONST, self.constant(FALSE))
+
+    def compileNoneLiteral(self, node: NoneLiteral):
+        self.emit(LOAD_CONST, self.constant(NONE))
+
+    def compileNumericLiteral(self, node: NumericLiteral):
+        self.emit(LOAD_CONST, self.constant(int_value(int(node.value))))
+
+    def compileIdentifier(self, node: Identifier):
+        self.emit(LOAD_NAME, self.name_index(node.name))
+
+    def compileLocalIdentifier(self, node: LocalIdentifier):
+        self.emit(LOAD_FAST, node.slot)
+
+    def compileGlobalIdentifier(self, node: GlobalIdentifier):
+        self.emit(LOAD_GLOBAL, self.name_index(node.name))
+
+    def compileCallExpression(self, node: CallExpression):
+        self.compile(node.name)
+        for p in node.params:
+            self.compile(p)
+        self.emit(CALL, len(node.params))
+
+
+def run_code(code: CodeObject, context_stack: ContextStack) -> Value:
+    base_depth = len(context_stack.stack)
+    try:
+        return dispatch(code, context_stack)
+    finally:
+        # Unwind frames left behind by an error so the stack is usable again
+        while len(context_stack.stack) > base_depth:
+            context_stack.leave()
+
+
+def dispatch(code: CodeObject, context_stack: ContextStack) -> Value:
+    # Suspended callers, saved as (code, slots, pc). All frames share one value stack: a call consumes its callee and
+    # arguments from it and its return value is pushed in their place, so nothing else has to be saved.
+    callers = []
+    save = callers.append
+    instructions = code.instructions
+    constants = code.constants
+    slots = context_stack.peek().slots
+    module_values = context_stack.stack[0].defined_values
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    pc = 0
+    # Ordered by how often each opcode runs, so the common ones take the fewest comparisons
+    while True:
+        op = instructions[pc]
+        arg = instructions[pc + 1]
+        pc += 2
+        if op == LOAD_FAST:
+            push(slots[arg])
+        elif op == LOAD_GLOBAL:
+            if module_values.version == code.global_versions[arg]:
+                push(code.global_values[arg])
+            elif val := module_values.get(code.names[arg]):
+                code.global_versions[arg] = module_values.version
+                code.global_values[arg] = val
+                push(val)
+            else:
+                raise Exception(f"Attribute '{code.names[arg]}' Not Found! Call Stack:" + str(module_values))
+        elif op == LOAD_CONST:
+            push(constants[arg])
+        elif op == COMPARE_EQ_CONST:
+            rhs = constants[arg]
+            lhs = stack[-1]
+            stack[-1] = TRUE if lhs.tag == rhs.tag and lhs.val == rhs.val else FALSE
+        elif op == POP_JUMP_IF_FALSE:
+            if not pop().is_truthy():
+                pc = arg
+        elif op == BINARY_SUBTRACT_CONST:
+            rhs = constants[arg]
+            lhs = stack[-1]
+            if lhs.tag == INT and rhs.tag == INT:
+                stack[-1] = int_value(lhs.val - rhs.val)
+            else:
+                stack[-1] = lhs - rhs
+        elif op == CALL:
+            callee = len(stack) - arg - 1
+            func: Value = stack[callee]
+            arguments = stack[callee + 1:]
+            del stack[callee:]
+            if func.tag != FUNC:
+                raise Exception("Cannot Call Non-Function!")
+            func = func.val
+            if arg != len(func.arguments):
+                raise Exception("Too Many or Too Few Arguments")
+            if type(func) is not BytecodeFunction:
+                push(func.call(context_stack, arguments))
+                continue
+            context_stack.enter(func.definition.frame_values(arguments), arguments, func.definition)
+            save((code, slots, pc))
+            code = func.code
+            instructions = code.instructions
+            constants = code.constants
+            slots = arguments
+            pc = 0
+        elif op == RETURN_VALUE:
+            if not callers:
+                return pop()
+            context_stack.leave()
+            code, slots, pc = callers.pop()
+            instructions = code.instructions
+            constants = code.constants
+        elif op == BINARY_ADD:
+            rhs = pop()
+            lhs = stack[-1]
+            if lhs.tag == INT and rhs.tag == INT:
+                stack[-1] = int_value(lhs.val + rhs.val)
+            else:
+                stack[-1] = lhs + rhs
+        elif op == BINARY_ADD_CONST:
+            rhs = constants[arg]
+            lhs = stack[-1]
+            if lhs.tag == INT and rhs.tag == INT:
+                stack[-1] = int_value(lhs.val + rhs.val)
+            else:
+                stack[-1] = lhs + rhs
+        elif op == BINARY_SUBTRACT:
+            rhs = pop()
+            lhs = stack[-1]
+            if lhs.tag == INT and rhs.tag == INT:
+                stack[-1] = int_value(lhs.val - rhs.val)
+            else:
+                stack[-1] = lhs - rhs
+        elif op == COMPARE_EQ:
+            rhs = pop()
+            lhs = stack[-1]
+            stack[-1] = TRUE if lhs.tag == rhs.tag and lhs.val == rhs.val else FALSE
+        elif op == POP_JUMP_IF_TRUE:
+            if pop().is_truthy():
+                pc = arg
+        elif op == JUMP:
+            pc = arg
+        elif op == UNARY_NOT:
+            stack[-1] = FALSE if stack[-1].is_truthy() else TRUE
+        elif op == LOAD_NAME:
+            name = code.names[arg]
+            for frame in context_stack.traverse():
+                if val := frame.defined_values.get(name):
+                    push(val)
+                    break
+            else:
+                raise Exception(
+                    f"Attribute '{name}' Not Found! Call Stack:" + str(context_stack.stack[0].defined_values))
+        elif op == STORE_NAME:
+            context_stack.peek().defined_values[code.names[arg]] = pop()
+        else:
+            raise Exception(f"Unknown opcode {op}")
+
+
+def run(syntaxtree: StatementList, context_stack: ContextStack) -> bool:
+    run_code(BytecodeCompiler("<module>").compile_body(syntaxtree), context_stack)
+    return False
@@ -0,0 +1,198 @@
+# Compiles syntax trees into nested python closures so that every node is dispatched once, ahead of time
+from typing import Callable
+
+from context.context_stack import ContextStack
+from tree.definitions import FuncDefinition
+from tree.expression import Expression, TernaryExpression, OrExpression, AndExpression, NotExpression, \
+    AddExpression, SubtractExpression, ConstantExpression, TrueLiteral, FalseLiteral, NoneLiteral, Identifier, \
+    LocalIdentifier, GlobalIdentifier, NumericLiteral, EqComparison, CallExpression
+from tree.statements import Statement, StatementList, SimpleStatementList, IfStatement, ReturnStatement
+from value.value import Value, FUNC, NONE, TRUE, FALSE, int_value, bool_value
+
+CompiledExpression = Callable[[ContextStack], Value]
+CompiledStatement = Callable[[ContextStack], bool]
+
+
+class CompiledFunction:
+
+    def __init__(self, definition: FuncDefinition, code: CompiledStatement):
+        self.definition = definition
+        self.name = definition.name
+        self.arguments = definition.arguments
+        self.code = code
+
+    def __str__(self):
+        return str(self.definition)
+
+    def call(self, context_stack: ContextStack, arguments: list[Value]) -> Value:
+        context_stack.enter(self.definition.frame_values(arguments), arguments, self.definition)
+        try:
+            self.code(context_stack)
+        finally:
+            ret = context_stack.leave()
+        return ret
+
+
+class ClosureCompiler:
+
+    def compile(self, node: Statement | StatementList | Expression):
+        for cls in type(node).__mro__:
+            if method := getattr(self, "compile" + cls.__name__, None):
+                return method(node)
+        raise Exception(f"Cannot compile '{type(node).__name__}' yet")
+
+    def compileStatementList(self, node: StatementList) -> CompiledStatement:
+        statements = tuple(map(self.compile, node.statements))
+        if len(statements) == 1:
+            return statements[0]
+
+        def run(context_stack: ContextStack) -> bool:
+            for s in statements:
+                if s(context_stack):
+                    return True
+            return False
+
+        return run
+
+    def compileSimpleStatementList(self, node: SimpleStatementList) -> CompiledStatement:
+        return self.compileStatementList(node)
+
+    def compileIfStatement(self, node: IfStatement) -> CompiledStatement:
+        condition = self.compile(node.condition)
+        code = self.compile(node.code)
+
+        def run(context_stack: ContextStack) -> bool:
+            if condition(context_stack).is_truthy():
+                return code(context_stack)
+            return False
+
+        return run
+
+    def compileReturnStatement(self, node: ReturnStatement) -> CompiledStatement:
+        expr = self.compile(node.expr)
+
+        def run(context_stack: ContextStack) -> bool:
+            context_stack.stack[-1].return_value = expr(context_stack)
+            return True
+
+        return run
+
+    def compileFuncDefinition(self, node: FuncDefinition) -> CompiledStatement:
+        name = node.name.name
+        function = Value("func", CompiledFunction(node, self.compile(node.code)))
+
+        def run(context_stack: ContextStack) -> bool:
+            context_stack.peek().defined_values[name] = function
+            return False
+
+        return run
+
+    def compileTernaryExpression(self, node: TernaryExpression) -> CompiledExpression:
+        condition = self.compile(node.condition)
+        lhs = self.compile(node.lhs)
+        rhs = self.compile(node.rhs)
+        return lambda context_stack: lhs(context_stack) if condition(context_stack).is_truthy() else rhs(context_stack)
+
+    def compileOrExpression(self, node: OrExpression) -> CompiledExpression:
+        lhs = self.compile(node.lhs)
+        rhs = self.compile(node.rhs)
+        return lambda context_stack: bool_value(lhs(context_stack).is_truthy() or rhs(context_stack).is_truthy())
+
+    def compileAndExpression(self, node: AndExpression) -> CompiledExpression:
+        lhs = self.compile(node.lhs)
+        rhs = self.compile(node.rhs)
+        return lambda context_stack: bool_value(lhs(context_stack).is_truthy() and rhs(context_stack).is_truthy())
+
+    def compileNotExpression(self, node: NotExpression) -> CompiledExpression:
+        operand = self.compile(node.operand)
+        return lambda context_stack: bool_value(not operand(context_stack).is_truthy())
+
+    def compileAddExpression(self, node: AddExpression) -> CompiledExpression:
+        lhs = self.compile(node.lhs)
+        rhs = self.compile(node.rhs)
+        return lambda context_stack: lhs(context_stack) + rhs(context_stack)
+
+    def compileSubtractExpression(self, node: SubtractExpression) -> CompiledExpression:
+        lhs = self.compile(node.lhs)
+        rhs = self.compile(node.rhs)
+        return lambda context_stack: lhs(context_stack) - rhs(context_stack)
+
+    def compileEqComparison(self, node: EqComparison) -> CompiledExpression:
+        lhs = self.compile(node.lhs)
+        rhs = self.compile(node.rhs)
+        return lambda context_stack: bool_value(lhs(context_stack) == rhs(context_stack))
+
+    def compileConstantExpression(self, node: ConstantExpression) -> CompiledExpression:
+        return self.constant(node.value)
+
+    def compileTrueLiteral(self, node: TrueLiteral) -> CompiledExpression:
+        return self.constant(TRUE)
+
+    def compileFalseLiteral(self, node: FalseLiteral) -> CompiledExpression:
+        return self.constant(FALSE)
+
+    def compileNoneLiteral(self, node: NoneLiteral) -> CompiledExpression:
+        return self.constant(NONE)
+
+    def compileNumericLiteral(self, node: NumericLiteral) -> CompiledExpression:
+        return self.constant(int_value(int(node.value)))
+
+    def compileIdentifier(self, node: Identifier) -> CompiledExpression:
+        name = node.name
+
+        def run(context_stack: ContextStack) -> Value:
+            for frame in context_stack.traverse():
+                if val := frame.defined_values.get(name):
+                    return val
+            raise Exception(f"Attribute '{name}' Not Found! Call Stack:" + str(context_stack.stack[0].defined_values))
+
+        return run
+
+    def compileLocalIdentifier(self, node: LocalIdentifier) -> CompiledExpression:
+        slot = node.slot
+        return lambda context_stack: context_stack.stack[-1].slots[slot]
+
+    def compileGlobalIdentifier(self, node: GlobalIdentifier) -> CompiledExpression:
+        name = node.name
+        cached_version = -1
+        cached_value = None
+
+        def run(context_stack: ContextStack) -> Value:
+            nonlocal cached_version, cached_value
+            values = context_stack.stack[0].defined_values
+            if values.version == cached_version:
+                return cached_value
+            if val := values.get(name):
+                cached_version = values.version
+                cached_value = val
+                return val
+            raise Exception(f"Attribute '{name}' Not Found! Call Stack:" + str(context_stack.stack[0].defined_values))
+
+        return run
+
+    def compileCallExpression(self, node: CallExpression) -> CompiledExpression:
+        callee = self.compile(node.name)
+        params = tuple(map(self.compile, node.params))
+
+        cached_callee = None
+
+        def run(context_stack: ContextStack) -> Value:
+            nonlocal cached_callee
+            func: Value = callee(context_stack)
+            if func is not cached_callee:
+                if func.tag != FUNC:
+                    raise Exception("Cannot Call Non-Function!")
+                if len(params) != len(func.val.arguments):
+                    raise Exception("Too Many or Too Few Arguments")
+                cached_callee = func
+            return func.val.call(context_stack, [param(context_stack) for param in params])
+
+        return run
+
+    @staticmethod
+    def constant(value: Value) -> CompiledExpression:
+        return lambda context_stack: value
+
+
+def run(syntaxtree: StatementList, context_stack: ContextStack) -> bool:
+    return ClosureCompiler().compile(syntaxtree)(context_stack)
@@ -0,0 +1,283 @@
+# Translates syntax trees into guarded python source that is compiled once and then runs at host speed.
+# Sandbox isolation comes from the tree itself: only the node types below can be translated, every sandbox name is
+# prefixed so it can never reach a host name, and the code runs in a namespace without builtins.
+import sys
+import warnings
+
+from context.context_stack import ContextStack
+from sandbox.errors import RecursionLimitExceeded, FuelExhausted, MemoryLimitExceeded
+from sandbox.memory import FRAME_SIZE, POINTER_SIZE, host_value_size
+from tree.definitions import FuncDefinition
+from tree.expression import Expression, TernaryExpression, OrExpression, AndExpression, NotExpression, \
+    AddExpression, SubtractExpression, ConstantExpression, TrueLiteral, FalseLiteral, NoneLiteral, Identifier, \
+    NumericLiteral, EqComparison, CallExpression
+from tree.resolver import bound_names
+from tree.statements import Statement, StatementList, SimpleStatementList, IfStatement, ReturnStatement
+from value.value import Value, BOOL, INT, NONE_TAG, FUNC, NONE, int_value, bool_value
+
+NAME_PREFIX = "s_"
+TRANSLATION_FILENAME = "<pyvte translation>"
+# The host recursion limit is raised by the sandbox one while translated code runs, deeper limits than this could
+# overflow the host's own stack on interpreters that still recurse in C for every python call
+MAX_RECURSION_LIMIT = 100000
+
+
+class TranslatedFunction:
+
+    def __init__(self, definition: FuncDefinition, host, translation: "Translation"):
+        self.definition = definition
+        self.name = definition.name
+        self.arguments = definition.arguments
+        self.host = host
+        self.translation = translation
+
+    def __str__(self):
+        return str(self.definition)
+
+    def call(self, context_stack: ContextStack, arguments: list[Value]) -> Value:
+        translation = self.translation
+        host_arguments = list(map(translation.to_host, arguments))
+        return translation.to_value(translation.enter(context_stack, self.host, host_arguments))
+
+    def call_host(self, context_stack: ContextStack, arguments: tuple) -> Value | int | bool | None:
+        # For callers that already hold plain ints, bools and None, which translated code takes as they are
+        result = self.translation.enter(context_stack, self.host, arguments)
+        return result if type(result) in (int, bool) or result is None else self.translation.to_value(result)
+
+
+class Translation:
+
+    def __init__(self, definitions: list[FuncDefinition], code, fueled: bool, metered: bool):
+        self.definitions = definitions
+        self.fueled = fueled
+        self.metered = metered
+        self.values: dict = {}
+        self.namespace = {
+            "__builtins__": {},
+            "_pyvte_depth": 0,
+            "_pyvte_fuel": 0,
+            "_pyvte_memory": 0,
+            "_pyvte_int": int,
+            "_pyvte_type": type,
+            "_pyvte_value_size": host_value_size,
+            "_pyvte_unimplemented": unimplemented,
+            "_pyvte_recursion_limit": recursion_limit_exceeded,
+            "_pyvte_out_of_fuel": out_of_fuel,
+            "_pyvte_out_of_memory": out_of_memory,
+        }
+        exec(code, self.namespace)
+
+    def enter(self, context_stack: ContextStack, host, arguments: list | tuple):
+        namespace = self.namespace
+        namespace["_pyvte_depth"] = len(context_stack.stack)
+        if self.fueled:
+            namespace["_pyvte_fuel"] = context_stack.fuel
+        if self.metered:
+            namespace["_pyvte_memory"] = context_stack.memory_used
+        # Translated calls recurse on the host stack, one host frame per sandbox call. The host limit is raised to
+        # fit the sandbox one while they run, so deep recursion stops at the sandbox limit, not with a RecursionError.
+        host_limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(host_limit + context_stack.recursion_limit)
+        try:
+            return host(*arguments)
+        finally:
+            sys.setrecursionlimit(host_limit)
+            if self.fueled:
+                context_stack.fuel = namespace["_pyvte_fuel"]
+            if self.metered:
+                context_stack.memory_used = namespace["_pyvte_memory"]
+
+    def to_host(self, value: Value):
+        if value.tag in (INT, BOOL, NONE_TAG):
+            return value.val
+        if value.tag == FUNC and isinstance(value.val, TranslatedFunction):
+            return value.val.host
+        raise Exception(f"Cannot pass a value of type '{value.ty}' into translated code")
+
+    def to_value(self, host) -> Value:
+        if host is None:
+            return NONE
+        if type(host) is bool:
+            return bool_value(host)
+        if type(host) is int:
+            return int_value(host)
+        if (value := self.values.get(host)) is None:
+            definition = self.definitions[host.__pyvte_definition__]
+            value = self.values[host] = Value("func", TranslatedFunction(definition, host, self))
+        return value
+
+
+def unimplemented():
+    raise Exception("Unimplemented")
+
+
+def recursion_limit_exceeded(limit: int):
+    raise RecursionLimitExceeded(limit)
+
+
+def out_of_fuel():
+    raise FuelExhausted()
+
+
+def out_of_memory(limit: int):
+    raise MemoryLimitExceeded(limit)
+
+
+class Translator:
+
+    def __init__(self, recursion_limit: int, fueled: bool, memory_limit: int | None):
+        self.recursion_limit = recursion_limit
+        self.fueled = fueled
+        self.memory_limit = memory_limit
+        self.lines: list[str] = []
+        self.definitions: list[FuncDefinition] = []
+        self.temporaries = 0
+
+    def source(self, syntaxtree: StatementList) -> str:
+        module_names = sorted(NAME_PREFIX + n for n in bound_names(syntaxtree))
+        self.line(0, "def _pyvte_module():")
+        if module_names:
+            self.line(1, "global " + ", ".join(module_names))
+        self.translate(syntaxtree, 1)
+        return "\n".join(self.lines) + "\n"
+
+    def line(self, indent: int, text: str):
+        self.lines.append("    " * indent + text)
+
+    def temporary(self) -> str:
+        self.temporaries += 1
+        return f"_pyvte_t{self.temporaries}"
+
+    def translate(self, node: Statement | StatementList | Expression, indent: int = 0):
+        for cls in type(node).__mro__:
+            if method := getattr(self, "translate" + cls.__name__, None):
+                return method(node, indent)
+        raise Exception(f"Cannot translate '{type(node).__name__}' yet")
+
+    def translateStatementList(self, node: StatementList, indent: int):
+        if not node.statements:
+            self.line(indent, "pass")
+        for s in node.statements:
+            self.translate(s, indent)
+
+    def translateSimpleStatementList(self, node: SimpleStatementList, indent: int):
+        self.translateStatementList(node, indent)
+
+    def translateIfStatement(self, node: IfStatement, indent: int):
+        self.line(indent, f"if {self.translate(node.condition)} is True:")
+        self.translate(node.code, indent + 1)
+
+    def translateReturnStatement(self, node: ReturnStatement, indent: int):
+        self.line(indent, f"return {self.translate(node.expr)}")
+
+    def translateFuncDefinition(self, node: FuncDefinition, indent: int):
+        name = NAME_PREFIX + node.name.name
+        guards = "_pyvte_depth"
+        if self.fueled:
+            guards += ", _pyvte_fuel"
+        if self.memory_limit is not None:
+            guards += ", _pyvte_memory"
+        arguments = [NAME_PREFIX + a.name for a in node.arguments]
+        self.line(indent, f"def {name}({', '.join(arguments)}):")
+        self.line(indent + 1, f"global {guards}")
+        if self.fueled:
+            self.line(indent + 1, "_pyvte_fuel -= 1")
+            self.line(indent + 1, "if _pyvte_fuel < 0:")
+            self.line(indent + 2, "_pyvte_out_of_fuel()")
+        self.line(indent + 1, "_pyvte_depth += 1")
+        self.line(indent + 1, f"if _pyvte_depth > {self.recursion_limit}:")
+        self.line(indent + 2, "_pyvte_depth -= 1")
+        self.line(indent + 2, f"_pyvte_recursion_limit({self.recursion_limit})")
+        if self.memory_limit is not None:
+            # Charged like the frames of the other engines, by the runtime width of the arguments
+            size = " + ".join([str(FRAME_SIZE + POINTER_SIZE * len(arguments))] +
+                              [f"_pyvte_value_size({a})" for a in arguments])
+            self.line(indent + 1, f"_pyvte_size = {size}")
+            self.line(indent + 1, "_pyvte_memory += _pyvte_size")
+            self.line(indent + 1, f"if _pyvte_memory > {self.memory_limit}:")
+            self.line(indent + 2, "_pyvte_depth -= 1")
+            self.line(indent + 2, "_pyvte_memory -= _pyvte_size")
+            self.line(indent + 2, f"_pyvte_out_of_memory({self.memory_limit})")
+        self.line(indent + 1, "try:")
+        self.translate(node.code, indent + 2)
+        self.line(indent + 1, "finally:")
+        self.line(indent + 2, "_pyvte_depth -= 1")
+        if self.memory_limit is not None:
+            self.line(indent + 2, "_pyvte_memory -= _pyvte_size")
+        self.line(indent, f"{name}.__pyvte_definition__ = {len(self.definitions)}")
+        self.definitions.append(node)
+
+    def translateTernaryExpression(self, node: TernaryExpression, indent: int) -> str:
+        condition = self.translate(node.condition)
+        return f"({self.translate(node.lhs)} if {condition} is True else {self.translate(node.rhs)})"
+
+    def translateOrExpression(self, node: OrExpression, indent: int) -> str:
+        return f"({self.translate(node.lhs)} is True or {self.translate(node.rhs)} is True)"
+
+    def translateAndExpression(self, node: AndExpression, indent: int) -> str:
+        return f"({self.translate(node.lhs)} is True and {self.translate(node.rhs)} is True)"
+
+    def translateNotExpression(self, node: NotExpression, indent: int) -> str:
+        return f"({self.translate(node.operand)} is not True)"
+
+    def arithmetic(self, node: AddExpression | SubtractExpression, operator: str) -> str:
+        lhs = self.temporary()
+        rhs = self.temporary()
+        # Both operands are always evaluated before the type guards, like the tree walker does
+        return (f"({lhs} {operator} {rhs} if (_pyvte_type({lhs} := {self.translate(node.lhs)}) is _pyvte_int) & "
+                f"(_pyvte_type({rhs} := {self.translate(node.rhs)}) is _pyvte_int) else _pyvte_unimplemented())")
+
+    def translateAddExpression(self, node: AddExpression, indent: int) -> str:
+        return self.arithmetic(node, "+")
+
+    def translateSubtractExpression(self, node: SubtractExpression, indent: int) -> str:
+        return self.arithmetic(node, "-")
+
+    def translateEqComparison(self, node: EqComparison, indent: int) -> str:
+        lhs = self.temporary()
+        rhs = self.temporary()
+        return (f"(_pyvte_type({lhs} := {self.translate(node.lhs)}) is "
+                f"_pyvte_type({rhs} := {self.translate(node.rhs)}) and {lhs} == {rhs})")
+
+    def translateConstantExpression(self, node: ConstantExpression, indent: int) -> str:
+        if node.value.tag not in (INT, BOOL, NONE_TAG):
+            raise Exception(f"Cannot translate a constant of type '{node.value.ty}'")
+        return repr(node.value.val)
+
+    def translateTrueLiteral(self, node: TrueLiteral, indent: int) -> str:
+        return "True"
+
+    def translateFalseLiteral(self, node: FalseLiteral, indent: int) -> str:
+        return "False"
+
+    def translateNoneLiteral(self, node: NoneLiteral, indent: int) -> str:
+        return "None"
+
+    def translateNumericLiteral(self, node: NumericLiteral, indent: int) -> str:
+        return f"_pyvte_int({str(node.value)!r})"
+
+    def translateIdentifier(self, node: Identifier, indent: int) -> str:
+        return NAME_PREFIX + node.name
+
+    def translateCallExpression(self, node: CallExpression, indent: int) -> str:
+        return f"{self.translate(node.name)}({', '.join(self.translate(p) for p in node.params)})"
+
+
+def run(syntaxtree: StatementList, context_stack: ContextStack) -> bool:
+    if context_stack.recursion_limit > MAX_RECURSION_LIMIT:
+        raise Exception(f"The translate engine supports recursion limits of at most {MAX_RECURSION_LIMIT}, "
+                        f"use the bytecode engine for deeper recursion")
+    fueled = context_stack.fuel is not None
+    translator = Translator(context_stack.recursion_limit, fueled, context_stack.memory_limit)
+    with warnings.catch_warnings():
+        # Folded constants can produce comparisons like `1 is True`, which are intended here
+        warnings.simplefilter("ignore", SyntaxWarning)
+        code = compile(translator.source(syntaxtree), TRANSLATION_FILENAME, "exec")
+    translation = Translation(translator.definitions, code, fueled, context_stack.memory_limit is not None)
+    translation.enter(context_stack, translation.namespace["_pyvte_module"], [])
+
+    module_values = context_stack.stack[0].defined_values
+    for name in bound_names(syntaxtree):
+        if (host := translation.namespace.get(NAME_PREFIX + name)) is not None:
+            module_values[name] = translation.to_value(host)
+    return False
@@ -0,0 +1,342 @@
+import argparse
+import hashlib
+import importlib
+import importlib.util
+import json
+import pickle
+import sys
+import time
+from types import FunctionType, ModuleType
+from typing import Any, Iterator, TextIO
+
+from cache.ast_cache import AstCache
+from context.context import Context
+from context.context_stack import ContextStack, DEFAULT_RECURSION_LIMIT
+from engine import bytecode, closure, translate
+from grading.results_cache import ResultsCache
+from sandbox.errors import FuelExhausted, MemoryLimitExceeded
+from profiling.node_profiler import MODULE_FRAME, NodeProfiler
+from profiling.sampler import Sampler
+from tree.fingerprint import fingerprint
+from tree.optimizer import Optimizer
+from tree.resolver import Resolver
+from tree.statements import StatementList
+from value.bridge import Bridge
+
+ENGINES = {
+    "tree": lambda syntaxtree, context_stack: syntaxtree.execute(context_stack),
+    "closure": closure.run,
+    "bytecode": bytecode.run,
+    "translate": translate.run,
+}
+
+# Imported lazily by parse, see import_frontend
+FRONTEND_MODULES = ["antlr4", "generated.PythonLexer", "generated.PythonParser", "tree.tree"]
+
+PASSED = "passed"
+FAILED = "failed"
+TIMED_OUT = "timed out"
+OUT_OF_MEMORY = "memory limit exceeded"
+# Outcome of a submission that could not be loaded at all
+ERROR = "error"
+
+
+def parse_tree(source: str):
+    # The generated parser is slow to import, so it is only loaded once something actually has to be parsed
+    from antlr4 import CommonTokenStream, InputStream
+    from generated.PythonLexer import PythonLexer
+    from generated.PythonParser import PythonParser
+
+    input_data = InputStream(source)
+    lexer = PythonLexer(input_data)
+    stream = CommonTokenStream(lexer)
+    parser = PythonParser(stream)
+    return parser.file_input()
+
+
+def build_syntax_tree(tree) -> StatementList:
+    from tree.tree import TreeVisitor
+
+    visitor = TreeVisitor()
+    return visitor.visitFile_input(tree)
+
+
+def parse(source: str) -> StatementList:
+    return build_syntax_tree(parse_tree(source))
+
+
+def import_frontend():
+    # For processes that fork graders and want the parser loaded once up front
+    for m in FRONTEND_MODULES:
+        importlib.import_module(m)
+
+
+def load_syntax_tree(file_to_test: str, cache_dir: str | None = None) -> StatementList:
+    with open(file_to_test, "r") as file:
+        filedata = file.read()
+    if cache_dir is None:
+        return parse(filedata)
+    return AstCache(cache_dir).get_or_parse(filedata, parse)
+
+
+def add_grader_arguments(arg_parser: argparse.ArgumentParser):
+    arg_parser.add_argument("--cache-dir", default=None,
+                            help="directory used to cache parsed syntax trees between runs")
+    arg_parser.add_argument("--engine", choices=ENGINES.keys(), default="tree",
+                            help="execution engine used to run the file to test")
+    arg_parser.add_argument("--recursion-limit", type=int, default=DEFAULT_RECURSION_LIMIT,
+                            help="maximum depth of the sandbox call stack")
+    arg_parser.add_argument("--fuel", type=int, default=None,
+                            help="maximum number of sandbox calls per test before it is reported as timed out")
+    arg_parser.add_argument("--memory-limit", type=int, default=None,
+                            help="approximate number of bytes the sandbox frames and their arguments may hold at once")
+    arg_parser.add_argument("--dedupe", action="store_true",
+                            help="reuse the results of an identical submission graded earlier in the same run")
+    arg_parser.add_argument("--results-dir", default=None,
+                            help="directory used to keep the results of graded submissions for reuse across runs")
+    arg_parser.add_argument("--rename-locals", action="store_true",
+                            help="also treat submissions that only differ in the names of function locals as identical")
+
+
+def add_results_argument(arg_parser: argparse.ArgumentParser):
+    arg_parser.add_argument("--results-jsonl", default=None,
+                            help="file that every test result is streamed to as one JSON line, - for stdout")
+
+
+def load_tests(test_file: str) -> ModuleType:
+    spec = importlib.util.spec_from_file_location("tests", test_file)
+    tests = importlib.util.module_from_spec(spec)
+    sys.modules["tests"] = tests
+    spec.loader.exec_module(tests)
+    return tests
+
+
+def test_functions(tests: ModuleType) -> list[str]:
+    return [n for n in dir(tests) if n.startswith("test") and type(getattr(tests, n)) == FunctionType]
+
+
+class TestResult:
+
+    def __init__(self, name: str, outcome: str, error: Exception | None = None, wall_time: float = 0.0,
+                 cpu_time: float = 0.0, fuel_used: int | None = None, cached: bool = False):
+        self.name = name
+        self.outcome = outcome
+        self.error = error
+        # Seconds the test took, in real and in process cpu time
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+        # Sandbox calls charged to the test, None when it ran without a fuel budget
+        self.fuel_used = fuel_used
+        # Set when the result was reused from an identical submission instead of running the test
+        self.cached = cached
+
+    def reused(self) -> "TestResult":
+        # Nothing ran, so no time is reported. The fuel used is kept, the same program always uses the same amount.
+        return TestResult(self.name, self.outcome, self.error, fuel_used=self.fuel_used, cached=True)
+
+    def to_dict(self) -> dict:
+        return {
+            "test": self.name,
+            "outcome": self.outcome,
+            "error": None if self.error is None else {"type": type(self.error).__name__, "message": str(self.error)},
+            "wall_time": self.wall_time,
+            "cpu_time": self.cpu_time,
+            "fuel_used": self.fuel_used,
+            "cached": self.cached,
+        }
+
+
+class GradeReport:
+
+    def __init__(self, submission: str, results: list[TestResult], error: Exception | None = None):
+        self.submission = submission
+        self.results = results
+        # Set when the submission could not be parsed or its module failed to run, in which case no test ran
+        self.error = error
+
+    @property
+    def passed(self) -> int:
+        return sum(1 for r in self.results if r.outcome == PASSED)
+
+    @property
+    def failed(self) -> int:
+        return len(self.results) - self.passed
+
+    @property
+    def timed_out(self) -> int:
+        return sum(1 for r in self.results if r.outcome == TIMED_OUT)
+
+    def to_dict(self) -> dict:
+        return {
+            "submission": self.submission,
+            "passed": self.passed,
+            "failed": self.failed,
+            "timed_out": self.timed_out,
+            "error": None if self.error is None else {"type": type(self.error).__name__, "message": str(self.error)},
+        }
+
+
+def portable(error: Exception | None) -> Exception | None:
+    # Errors are sent to other processes and cached on disk, anything that cannot be pickled is kept as its message
+    try:
+        pickle.dumps(error)
+        return error
+    except Exception:
+        return Exception(f"{type(error).__name__}: {error}")
+
+
+def open_results(path: str | None) -> TextIO | None:
+    if path is None:
+        return None
+    return sys.stdout if path == "-" else open(path, "w")
+
+
+def write_jsonl(file: TextIO, submission: str, result: TestResult | None, error: Exception | None = None):
+    # One line per test as soon as it finishes, or a single line without a test for a submission that failed to load
+    if result is None:
+        line = {"test": None, "outcome": ERROR, "error": {"type": type(error).__name__, "message": str(error)}}
+    else:
+        line = result.to_dict()
+    file.write(json.dumps({"submission": submission, **line}) + "\n")
+    file.flush()
+
+
+class Grader:
+
+    def __init__(self, test_file: str, cache_dir: str | None = None, engine: str = "tree",
+                 recursion_limit: int = DEFAULT_RECURSION_LIMIT, fuel: int | None = None,
+                 memory_limit: int | None = None, results_dir: str | None = None, dedupe: bool = False,
+                 rename_locals: bool = False):
+        self.tests = load_tests(test_file)
+        self.test_names = test_functions(self.tests)
+        with open(test_file, "rb") as file:
+            self.tests_hash = hashlib.sha256(file.read()).hexdigest()
+        self.cache_dir = cache_dir
+        self.engine = engine
+        self.recursion_limit = recursion_limit
+        self.fuel = fuel
+        self.memory_limit = memory_limit
+        # Submissions with the same fingerprint as one graded before reuse its results instead of running again
+        self.results = ResultsCache(results_dir) if dedupe or results_dir is not None else None
+        self.rename_locals = rename_locals
+        # Set to a NodeProfiler to profile the module and every test, only the tree engine runs the profiled nodes
+        self.profiler: NodeProfiler | None = None
+        # Set to a started Sampler to sample the sandbox call stack of every submission graded
+        self.sampler: Sampler | None = None
+        # Host values the last submission copied onto the tests module by name, put back after every test and removed
+        # before the next submission is graded
+        self.exported: dict[str, Any] = {}
+
+    def new_context(self) -> ContextStack:
+        # Every submission gets its own module context, nothing is shared with the ones graded before it
+        return ContextStack([Context()], self.recursion_limit, self.fuel, self.memory_limit)
+
+    def load(self, file_to_test: str) -> ContextStack:
+        context = self.new_context()
+        self.run_module(load_syntax_tree(file_to_test, self.cache_dir), context)
+        return context
+
+    def run_module(self, syntaxtree: StatementList, context: ContextStack):
+        syntaxtree = Resolver().resolve(Optimizer().optimize(syntaxtree))
+        if self.profiler is not None:
+            if self.engine != "tree":
+                raise Exception("Profiling is only supported with the tree engine")
+            self.profiler.install(syntaxtree)
+            self.profiler.set_root(MODULE_FRAME)
+
+        ENGINES[self.engine](syntaxtree, context)
+
+    def unexport(self):
+        for k in self.exported:
+            if hasattr(self.tests, k):
+                delattr(self.tests, k)
+        self.exported = {}
+
+    def export(self, context: ContextStack):
+        self.unexport()
+        # Tests see plain host values, sandbox functions become callables that marshal their arguments
+        bridge = Bridge(context)
+        self.exported = {k: bridge.to_host(v) for k, v in context.stack[0].defined_values.items()}
+        for k, v in self.exported.items():
+            setattr(self.tests, k, v)
+
+    def run_test(self, context: ContextStack, name: str) -> TestResult:
+        # Every test gets the full budget, independent of how much the ones before it used
+        context.fuel = self.fuel
+        # and starts from the module state left by the submission, whatever the tests before it changed
+        module_values = context.stack[0].defined_values
+        snapshot = module_values.snapshot()
+        if self.profiler is not None:
+            self.profiler.set_root(name)
+        if self.sampler is not None:
+            self.sampler.set_root(name)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            getattr(self.tests, name)()
+            result = TestResult(name, PASSED)
+        except FuelExhausted as e:
+            result = TestResult(name, TIMED_OUT, e)
+        except MemoryLimitExceeded as e:
+            result = TestResult(name, OUT_OF_MEMORY, e)
+        except Exception as e:
+            result = TestResult(name, FAILED, e)
+        finally:
+            module_values.restore(snapshot)
+            # A test can rebind the exported names with `global`, the next one still gets the submission's values
+            test_values = vars(self.tests)
+            for k, v in self.exported.items():
+                if test_values.get(k) is not v:
+                    test_values[k] = v
+        result.wall_time = time.perf_counter() - wall_start
+        result.cpu_time = time.process_time() - cpu_start
+        if self.fuel is not None:
+            result.fuel_used = self.fuel - max(context.fuel, 0)
+        return result
+
+    def run_tests(self, file_to_test: str, test_names: list[str] | None = None) -> Iterator[TestResult]:
+        # Yields every result as soon as its test finishes
+        syntaxtree = load_syntax_tree(file_to_test, self.cache_dir)
+        if test_names is None:
+            test_names = self.test_names
+        key = None
+        if self.results is not None and self.profiler is None:
+            # The fingerprint is taken before the optimizer and the engines get to change the tree
+            options = (self.engine, self.recursion_limit, self.fuel, self.memory_limit)
+            key = self.results.key(self.tests_hash, options, test_names, fingerprint(syntaxtree, self.rename_locals))
+            if (results := self.results.load(key)) is not None:
+                for r in results:
+                    yield r.reused()
+                return
+
+        context = self.new_context()
+        if self.sampler is not None:
+            self.sampler.attach(context, file_to_test)
+        results = []
+        try:
+            try:
+                self.run_module(syntaxtree, context)
+                self.export(context)
+            except (FuelExhausted, MemoryLimitExceeded) as e:
+                # The submission's own top level code ran out of budget, none of the tests can run without it
+                self.unexport()
+                outcome = TIMED_OUT if isinstance(e, FuelExhausted) else OUT_OF_MEMORY
+                fuel_used = None if self.fuel is None else self.fuel - max(context.fuel, 0)
+                for n in test_names:
+                    results.append(result := TestResult(n, outcome, e, fuel_used=fuel_used))
+                    yield result
+            else:
+                for n in test_names:
+                    results.append(result := self.run_test(context, n))
+                    yield result
+        finally:
+            # Whatever runs before the next submission is attached, like parsing it, is not charged to this one
+            if self.sampler is not None:
+                self.sampler.detach()
+        if key is not None:
+            for r in results:
+                r.error = portable(r.error)
+            self.results.store(key, results)
+
+    def grade(self, file_to_test: str, test_names: list[str] | None = None) -> GradeReport:
+        return GradeReport(file_to_test, list(self.run_tests(file_to_test, test_names)))
@@ -0,0 +1,58 @@
+import hashlib
+import os
+import sys
+
+from cache.disk_store import DiskStore
+
+# Bump whenever TestResult changes shape so that stale entries are never loaded
+RESULTS_FORMAT_VERSION = 2
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Packages whose code decides the outcome of a test. Results are only reused by the exact same code, helper modules
+# imported by a test file are not covered.
+INTERPRETER_PACKAGES = ["cache", "context", "engine", "generated", "grading", "profiling", "sandbox", "tree", "value"]
+
+
+def code_version() -> str:
+    digest = hashlib.sha256(sys.version.encode())
+    for package in INTERPRETER_PACKAGES:
+        for directory, _, files in sorted(os.walk(os.path.join(SRC_DIR, package))):
+            for n in sorted(files):
+                if n.endswith(".py"):
+                    path = os.path.join(directory, n)
+                    digest.update(os.path.relpath(path, SRC_DIR).encode() + b"\0")
+                    with open(path, "rb") as file:
+                        digest.update(hashlib.sha256(file.read()).digest())
+    return digest.hexdigest()
+
+
+class ResultsCache:
+    # Grading results of already seen programs, kept in memory for one run and on disk across runs if a directory
+    # is given. Entries are keyed by the interpreter's code, the test file, the grading options and the program's
+    # fingerprint.
+
+    def __init__(self, directory: str | None = None):
+        self.directory = directory
+        self.disk = None if directory is None else DiskStore(directory, ".results")
+        self.entries: dict[str, list] = {}
+        self.code_version = code_version()
+
+    def key(self, tests_hash: str, options: tuple, test_names: list[str], fingerprint: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"pyvte-results-{RESULTS_FORMAT_VERSION}-{self.code_version}\0".encode())
+        digest.update(f"{tests_hash}\0{options!r}\0".encode())
+        digest.update(f"{','.join(test_names)}\0{fingerprint}".encode())
+        return digest.hexdigest()
+
+    def load(self, key: str) -> list | None:
+        if (results := self.entries.get(key)) is not None or self.disk is None:
+            return results
+        if (results := self.disk.load(key)) is not None:
+            self.entries[key] = results
+        return results
+
+    def store(self, key: str, results: list):
+        self.entries[key] = results
+        if self.disk is not None:
+            self.disk.store(key, results)
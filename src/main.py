@@ -1,68 +1,86 @@
-import importlib
-import importlib.util
-import re
+import argparse
 import sys
 
-from antlr4 import *
+from context.context_stack import DEFAULT_RECURSION_LIMIT
+from grading.grader import FAILED, OUT_OF_MEMORY, TIMED_OUT, GradeReport, Grader, add_grader_arguments, \
+    add_results_argument, open_results, write_jsonl
+from profiling.node_profiler import NodeProfiler
+from profiling.sampler import Sampler, add_sampler_arguments, sampler_from_arguments, write_samples
 
-import value.value
-from context.context import Context
-from context.context_stack import ContextStack
-from generated.PythonLexer import PythonLexer
-from generated.PythonParser import PythonParser
-from tree.tree import TreeVisitor
 
+def main(test_file: str, file_to_test: str, cache_dir: str | None = None, engine: str = "tree",
+         recursion_limit: int = DEFAULT_RECURSION_LIMIT, fuel: int | None = None, memory_limit: int | None = None,
+         results_jsonl: str | None = None, results_dir: str | None = None, dedupe: bool = False,
+         rename_locals: bool = False, profile_collapsed: str | None = None, profile_lines: str | None = None,
+         sampler: Sampler | None = None):
+    grader = Grader(test_file, cache_dir, engine, recursion_limit, fuel, memory_limit, results_dir, dedupe,
+                    rename_locals)
+    if profile_collapsed is not None or profile_lines is not None:
+        grader.profiler = NodeProfiler()
+    if sampler is not None:
+        grader.sampler = sampler
+        sampler.start()
+    results_file = open_results(results_jsonl)
+    # With the results streamed to stdout, the human readable summary is left out so the stream stays parseable
+    quiet = results_file is sys.stdout
+    report = GradeReport(file_to_test, [])
 
-def main(test_file: str, file_to_test: str):
-    spec = importlib.util.spec_from_file_location("tests", test_file)
-    tests = importlib.util.module_from_spec(spec)
-    sys.modules["tests"] = tests
-    spec.loader.exec_module(tests)
+    try:
+        for r in grader.run_tests(file_to_test):
+            report.results.append(r)
+            if results_file is not None:
+                write_jsonl(results_file, file_to_test, r)
+            if quiet:
+                continue
+            if r.outcome == TIMED_OUT:
+                print(r.name + ": Timed Out")
+            elif r.outcome == OUT_OF_MEMORY:
+                print(r.name + ": Memory Limit Exceeded")
+            elif r.outcome == FAILED:
+                print(f"{r.name}: {type(r.error).__name__}: {r.error}")
+    except Exception as e:
+        if results_file is None:
+            raise
+        write_jsonl(results_file, file_to_test, None, e)
+    finally:
+        if sampler is not None:
+            sampler.stop()
+        if results_file is not None and not quiet:
+            results_file.close()
 
-    with open(file_to_test, "r") as file:
-        filedata = file.read()
-    input_data = InputStream(filedata)
-    lexer = PythonLexer(input_data)
-    stream = CommonTokenStream(lexer)
-    parser = PythonParser(stream)
-    tree = parser.file_input()
-    visitor = TreeVisitor()
-    syntaxtree = visitor.visitFile_input(tree)
+    if profile_collapsed is not None:
+        with open(profile_collapsed, "w") as file:
+            grader.profiler.write_collapsed(file)
+    if profile_lines is not None:
+        with open(file_to_test, "r") as file:
+            source = file.read()
+        with open(profile_lines, "w") as file:
+            grader.profiler.write_lines(file, source)
 
-    module_context = Context()
-    context = ContextStack([module_context])
-    syntaxtree.execute(context)
-    value.value.global_context = context
-
-    to_test_name = re.split(r"[\\/]", file_to_test.rsplit('.', 1)[0])[-1]
-
-    test_funcs = []
-
-    for n in dir(tests):
-        if n.startswith("test") and type(getattr(tests, n)) == type(main):
-            test_funcs.append(n)
-
-    for k, v in module_context.defined_values.items():
-        setattr(tests, k, v)
-
-    passed = 0
-    failed = 0
-    for f in test_funcs:
-        try:
-            getattr(tests, f)()
-            passed += 1
-        except Exception:
-            print()
-            failed += 1
-
-    print("Tests Run:    " + str(passed + failed))
-    print("Tests Passed: " + str(passed))
-    print("Tests Failed: " + str(failed))
+    if quiet:
+        return
+    print("Tests Run:    " + str(report.passed + report.failed))
+    print("Tests Passed: " + str(report.passed))
+    print("Tests Failed: " + str(report.failed))
+    print("Tests Timed Out: " + str(report.timed_out))
     print("Exiting...")
 
 
 if __name__ == '__main__':
-    if len(sys.argv) < 3:
-        print("Usage: `python3 main.py <Path to test file> <Path to file to test>")
-    else:
-        main(sys.argv[1], sys.argv[2])
+    arg_parser = argparse.ArgumentParser(usage="python3 main.py <Path to test file> <Path to file to test>")
+    arg_parser.add_argument("test_file")
+    arg_parser.add_argument("file_to_test")
+    add_grader_arguments(arg_parser)
+    add_results_argument(arg_parser)
+    arg_parser.add_argument("--profile-collapsed", default=None,
+                            help="profile the tree engine and write collapsed stacks for a flamegraph to this file")
+    arg_parser.add_argument("--profile-lines", default=None,
+                            help="profile the tree engine and write time per source line and function to this file")
+    add_sampler_arguments(arg_parser)
+    args = arg_parser.parse_args()
+    sampler = sampler_from_arguments(args)
+    main(args.test_file, args.file_to_test, args.cache_dir, args.engine, args.recursion_limit, args.fuel,
+         args.memory_limit, args.results_jsonl, args.results_dir, args.dedupe, args.rename_locals,
+         args.profile_collapsed, args.profile_lines, sampler)
+    if sampler is not None:
+        write_samples(sampler, args)
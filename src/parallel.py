@@ -0,0 +1,126 @@
+import argparse
+import multiprocessing
+import os
+import sys
+
+from batch import print_report, submissions
+from context.context_stack import DEFAULT_RECURSION_LIMIT
+from grading.grader import GradeReport, Grader, TestResult, add_grader_arguments, add_results_argument, \
+    open_results, portable, write_jsonl
+
+# Jobs a worker runs before it is replaced, so memory leaked by one submission cannot pile up
+DEFAULT_JOBS_PER_WORKER = 50
+
+# Each worker process grades with its own Grader, created once by init_worker
+worker_grader: Grader | None = None
+
+
+def init_worker(test_file: str, cache_dir: str | None, engine: str, recursion_limit: int, fuel: int | None,
+                memory_limit: int | None, results_dir: str | None, dedupe: bool, rename_locals: bool):
+    global worker_grader
+    # With --dedupe alone every worker only remembers the submissions it graded itself
+    worker_grader = Grader(test_file, cache_dir, engine, recursion_limit, fuel, memory_limit, results_dir, dedupe,
+                           rename_locals)
+
+
+def grade_job(job: tuple[str, str | None]) -> GradeReport:
+    file_to_test, test_name = job
+    try:
+        report = worker_grader.grade(file_to_test, None if test_name is None else [test_name])
+    except Exception as e:
+        report = GradeReport(file_to_test, [], e)
+    report.error = portable(report.error)
+    for r in report.results:
+        r.error = portable(r.error)
+    return report
+
+
+def grade_parallel(test_file: str, files: list[str], cache_dir: str | None = None, engine: str = "tree",
+                   recursion_limit: int = DEFAULT_RECURSION_LIMIT, fuel: int | None = None,
+                   memory_limit: int | None = None, processes: int | None = None,
+                   jobs_per_worker: int = DEFAULT_JOBS_PER_WORKER, test_names: list[str] | None = None,
+                   results_dir: str | None = None, dedupe: bool = False, rename_locals: bool = False):
+    # Given test names are scheduled as one job each, otherwise every submission is a single job
+    if test_names is not None:
+        jobs = [(f, n) for f in files for n in test_names]
+    else:
+        jobs = [(f, None) for f in files]
+
+    pending: dict[str, list[TestResult]] = {}
+    errored: set[str] = set()
+    with multiprocessing.Pool(processes, init_worker,
+                              (test_file, cache_dir, engine, recursion_limit, fuel, memory_limit, results_dir,
+                               dedupe, rename_locals),
+                              maxtasksperchild=jobs_per_worker) as pool:
+        # One job per task, handed out as workers free up, so a few slow submissions never hold up a whole chunk
+        for report in pool.imap_unordered(grade_job, jobs, chunksize=1):
+            if test_names is None:
+                yield report
+            elif report.error is not None:
+                # Every test job of a submission that fails to load reports the same error, only the first is kept
+                if report.submission not in errored:
+                    errored.add(report.submission)
+                    pending.pop(report.submission, None)
+                    yield report
+            elif report.submission not in errored:
+                results = pending.setdefault(report.submission, [])
+                results += report.results
+                if len(results) == len(test_names):
+                    del pending[report.submission]
+                    results.sort(key=lambda r: test_names.index(r.name))
+                    yield GradeReport(report.submission, results)
+
+
+def main(test_file: str, submissions_path: str, cache_dir: str | None = None, engine: str = "tree",
+         recursion_limit: int = DEFAULT_RECURSION_LIMIT, fuel: int | None = None, memory_limit: int | None = None,
+         processes: int | None = None, jobs_per_worker: int = DEFAULT_JOBS_PER_WORKER, per_test: bool = False,
+         results_jsonl: str | None = None, results_dir: str | None = None, dedupe: bool = False,
+         rename_locals: bool = False):
+    # The tests module is only loaded once in the parent, the workers load their own
+    test_names = Grader(test_file).test_names
+    results_file = open_results(results_jsonl)
+    quiet = results_file is sys.stdout
+    graded = 0
+    errors = 0
+    try:
+        for report in grade_parallel(test_file, submissions(submissions_path), cache_dir, engine, recursion_limit,
+                                     fuel, memory_limit, processes, jobs_per_worker,
+                                     test_names if per_test else None, results_dir, dedupe, rename_locals):
+            graded += 1
+            errors += report.error is not None
+            if results_file is not None:
+                # Results arrive a whole submission at a time here, so the stream is written per submission
+                if report.error is not None:
+                    write_jsonl(results_file, report.submission, None, report.error)
+                for r in report.results:
+                    write_jsonl(results_file, report.submission, r)
+            if not quiet:
+                print_report(report, len(test_names))
+    finally:
+        if results_file is not None and not quiet:
+            results_file.close()
+
+    if quiet:
+        return
+    print("Submissions Graded: " + str(graded))
+    print("Submissions Errored: " + str(errors))
+    print("Exiting...")
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(
+        usage="python3 parallel.py <Path to test file> <Path to submissions directory or manifest>")
+    arg_parser.add_argument("test_file")
+    arg_parser.add_argument("submissions")
+    add_grader_arguments(arg_parser)
+    arg_parser.add_argument("--processes", type=int, default=os.cpu_count(),
+                            help="number of worker processes")
+    arg_parser.add_argument("--jobs-per-worker", type=int, default=DEFAULT_JOBS_PER_WORKER,
+                            help="number of jobs a worker process runs before it is replaced")
+    arg_parser.add_argument("--per-test", action="store_true",
+                            help="schedule every test function of every submission as its own job")
+    add_results_argument(arg_parser)
+    args = arg_parser.parse_args()
+    main(args.test_file, args.submissions, args.cache_dir, args.engine, args.recursion_limit, args.fuel,
+         args.memory_limit, args.processes, args.jobs_per_worker, args.per_test, args.results_jsonl, args.results_dir,
+         args.dedupe, args.rename_locals)
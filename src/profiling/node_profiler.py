@@ -0,0 +1,135 @@
+# Deterministic profiler for the tree engine. It is installed by switching every node of a syntax tree to a profiled
+# subclass of its own class, so trees that are not profiled run exactly the code they always do.
+import time
+from typing import TextIO
+
+from tree.statements import StatementList
+from tree.traversal import Node, children
+
+# Profiled methods, call is only defined by FuncDefinition and times a whole sandbox call
+PROFILED_METHODS = ("evaluate", "execute", "call")
+
+MODULE_FRAME = "<module>"
+
+
+class NodeStats:
+
+    def __init__(self, node: Node, method: str):
+        self.node = node
+        self.method = method
+        self.count = 0
+        # Seconds spent in the node including its children, counted once for recursive activations
+        self.cumulative = 0.0
+        # Seconds spent in the node itself
+        self.own = 0.0
+        self.active = 0
+
+
+class NodeProfiler:
+
+    def __init__(self):
+        self.stats: dict[tuple[int, str], NodeStats] = {}
+        # Profiled subclass for every node class seen so far
+        self.classes: dict[type, type] = {}
+        # Active activations, as [stats, start, time spent in children]
+        self.stack: list[list] = []
+        # Names of the sandbox functions currently running, below the frame the profile is attributed to
+        self.frames: list[str] = [MODULE_FRAME]
+        self.collapsed: dict[tuple[str, ...], float] = {}
+
+    def set_root(self, name: str):
+        # Test functions call into the sandbox from the host, so they are the roots of their stacks
+        self.frames = [name]
+
+    def install(self, syntaxtree: StatementList):
+        self.install_node(syntaxtree, None)
+
+    def install_node(self, node: Node, line: int | None):
+        # Nodes created by later passes, like folded constants, have no line of their own and take their parent's
+        if node.line is None:
+            node.line = line
+        node.__class__ = self.profiled_class(type(node))
+        for c in children(node):
+            self.install_node(c, node.line)
+
+    def profiled_class(self, cls: type) -> type:
+        if (profiled := self.classes.get(cls)) is not None or getattr(cls, "profiler", None) is self:
+            return profiled or cls
+        namespace = {"profiler": self}
+        for method in PROFILED_METHODS:
+            if (original := getattr(cls, method, None)) is not None:
+                namespace[method] = self.wrap(cls, method, original)
+        profiled = self.classes[cls] = type("Profiled" + cls.__name__, (cls,), namespace)
+        return profiled
+
+    def wrap(self, cls: type, method: str, original):
+        profiler = self
+
+        def profiled(node, *args):
+            profiler.enter(node, method)
+            try:
+                return original(node, *args)
+            finally:
+                profiler.leave(node)
+                # Quickened nodes switch their own class while running, the new one has to be profiled as well
+                if node.__class__.__dict__.get("profiler") is not profiler:
+                    node.__class__ = profiler.profiled_class(node.__class__)
+
+        return profiled
+
+    def enter(self, node: Node, method: str):
+        key = (id(node), method)
+        if (stats := self.stats.get(key)) is None:
+            stats = self.stats[key] = NodeStats(node, method)
+        stats.count += 1
+        stats.active += 1
+        if method == "call":
+            self.frames.append(f"{node.name.name}:{node.line}")
+        self.stack.append([stats, time.perf_counter(), 0.0])
+
+    def leave(self, node: Node):
+        stats, start, in_children = self.stack.pop()
+        elapsed = time.perf_counter() - start
+        own = elapsed - in_children
+        stats.active -= 1
+        if stats.active == 0:
+            stats.cumulative += elapsed
+        stats.own += own
+        if self.stack:
+            self.stack[-1][2] += elapsed
+        key = tuple(self.frames) + (f"line {node.line}",)
+        self.collapsed[key] = self.collapsed.get(key, 0.0) + own
+        if stats.method == "call":
+            self.frames.pop()
+
+    def functions(self) -> list[NodeStats]:
+        return [s for s in self.stats.values() if s.method == "call"]
+
+    def lines(self) -> dict[int | None, tuple[int, float]]:
+        # Statement executions and own time per source line
+        lines = {}
+        for s in self.stats.values():
+            count, own = lines.get(s.node.line, (0, 0.0))
+            counted = s.method == "execute" and not isinstance(s.node, StatementList)
+            lines[s.node.line] = (count + (s.count if counted else 0), own + s.own)
+        return lines
+
+    def write_collapsed(self, file: TextIO):
+        # One "frame;frame;leaf microseconds" line per stack, the input format of flamegraph.pl and speedscope
+        for stack, seconds in sorted(self.collapsed.items()):
+            if (us := round(seconds * 1e6)) > 0:
+                file.write(";".join(stack) + f" {us}\n")
+
+    def write_lines(self, file: TextIO, source: str | None = None):
+        source_lines = source.splitlines() if source is not None else []
+        file.write(f"{'Line':>6} {'Hits':>10} {'Time (ms)':>12}  Source\n")
+        lines = self.lines()
+        for line in sorted(lines, key=lambda l: -1 if l is None else l):
+            hits, own = lines[line]
+            text = source_lines[line - 1].rstrip() if line is not None and line <= len(source_lines) else ""
+            file.write(f"{'?' if line is None else line:>6} {hits:>10} {own * 1000:>12.3f}  {text}\n")
+        file.write("\n")
+        file.write(f"{'Function':<30} {'Calls':>10} {'Cumulative (ms)':>16} {'Own (ms)':>12}\n")
+        for s in sorted(self.functions(), key=lambda s: s.cumulative, reverse=True):
+            name = f"{s.node.name.name}:{s.node.line}"
+            file.write(f"{name:<30} {s.count:>10} {s.cumulative * 1000:>16.3f} {s.own * 1000:>12.3f}\n")
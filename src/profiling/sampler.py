@@ -0,0 +1,138 @@
+# Statistical profiler that periodically samples the sandbox's logical call stack, from a background thread or from a
+# profiling timer signal. Cheap enough to leave on at a low rate, unlike the per-node profiler.
+import argparse
+import signal
+import sys
+import threading
+from typing import TextIO
+
+from context.context_stack import ContextStack
+from engine.translate import NAME_PREFIX, TRANSLATION_FILENAME
+from profiling.node_profiler import MODULE_FRAME
+
+DEFAULT_INTERVAL = 0.01
+
+
+class Sampler:
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, use_signal: bool = False):
+        self.interval = interval
+        self.use_signal = use_signal
+        self.context_stack: ContextStack | None = None
+        self.submission = ""
+        self.root = MODULE_FRAME
+        self.samples: dict[tuple[str, ...], int] = {}
+        self.thread_id = threading.get_ident()
+        self.stopped = threading.Event()
+        self.thread: threading.Thread | None = None
+
+    def attach(self, context_stack: ContextStack, submission: str):
+        self.context_stack = context_stack
+        self.submission = submission
+        self.root = MODULE_FRAME
+
+    def detach(self):
+        self.context_stack = None
+
+    def set_root(self, name: str):
+        self.root = name
+
+    def start(self):
+        # Samples the thread that starts the sampler, which has to be the one that grades
+        self.thread_id = threading.get_ident()
+        if self.use_signal:
+            signal.signal(signal.SIGPROF, lambda signum, frame: self.sample())
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        else:
+            self.stopped.clear()
+            self.thread = threading.Thread(target=self.run, name="pyvte-sampler", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        if self.use_signal:
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, signal.SIG_DFL)
+        elif self.thread is not None:
+            self.stopped.set()
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        if (context_stack := self.context_stack) is None:
+            return
+        # A copy, the grading thread keeps pushing and popping while it is read
+        frames = list(context_stack.stack)
+        stack = [self.submission, self.root]
+        for frame in frames[1:]:
+            if (definition := frame.definition) is not None:
+                stack.append(f"{definition.name.name}:{definition.line}")
+        if len(frames) <= 1:
+            # Translated code keeps no sandbox frames, its functions are found on the host stack instead
+            if not (translated := self.translated_frames()):
+                # No sandbox function is running, the time is spent in the test or the grader itself
+                return
+            stack += translated
+        key = tuple(stack)
+        self.samples[key] = self.samples.get(key, 0) + 1
+
+    def translated_frames(self) -> list[str]:
+        frame = sys._current_frames().get(self.thread_id)
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            if code.co_filename == TRANSLATION_FILENAME and code.co_name.startswith(NAME_PREFIX):
+                names.append(code.co_name[len(NAME_PREFIX):])
+            frame = frame.f_back
+        return names[::-1]
+
+    def total(self) -> int:
+        return sum(self.samples.values())
+
+    def write_collapsed(self, file: TextIO):
+        # Same format as NodeProfiler.write_collapsed, weighted by sample count instead of microseconds
+        for stack, count in sorted(self.samples.items()):
+            file.write(";".join(stack) + f" {count}\n")
+
+    def write_summary(self, file: TextIO):
+        own: dict[str, int] = {}
+        inclusive: dict[str, int] = {}
+        for stack, count in self.samples.items():
+            own[stack[-1]] = own.get(stack[-1], 0) + count
+            for name in set(stack):
+                inclusive[name] = inclusive.get(name, 0) + count
+        total = max(self.total(), 1)
+        file.write(f"{self.total()} samples every {self.interval * 1000:g} ms\n")
+        file.write(f"{'Function':<30} {'Own':>10} {'Own %':>8} {'Total':>10} {'Total %':>8}\n")
+        for name in sorted(inclusive, key=lambda n: (own.get(n, 0), inclusive[n]), reverse=True):
+            file.write(f"{name:<30} {own.get(name, 0):>10} {own.get(name, 0) * 100 / total:>8.1f} "
+                       f"{inclusive[name]:>10} {inclusive[name] * 100 / total:>8.1f}\n")
+
+
+def add_sampler_arguments(arg_parser: argparse.ArgumentParser):
+    arg_parser.add_argument("--sample-collapsed", default=None,
+                            help="sample the sandbox call stack and write collapsed stacks to this file")
+    arg_parser.add_argument("--sample-summary", default=None,
+                            help="sample the sandbox call stack and write samples per function to this file")
+    arg_parser.add_argument("--sample-interval", type=float, default=DEFAULT_INTERVAL,
+                            help="seconds between two samples")
+    arg_parser.add_argument("--sample-signal", action="store_true",
+                            help="take samples from a profiling timer signal instead of a background thread")
+
+
+def sampler_from_arguments(args: argparse.Namespace) -> Sampler | None:
+    if args.sample_collapsed is None and args.sample_summary is None:
+        return None
+    return Sampler(args.sample_interval, args.sample_signal)
+
+
+def write_samples(sampler: Sampler, args: argparse.Namespace):
+    if args.sample_collapsed is not None:
+        with open(args.sample_collapsed, "w") as file:
+            sampler.write_collapsed(file)
+    if args.sample_summary is not None:
+        with open(args.sample_summary, "w") as file:
+            sampler.write_summary(file)
@@ -0,0 +1,33 @@
+class SandboxError(Exception):
+    pass
+
+
+class RecursionLimitExceeded(SandboxError):
+
+    def __init__(self, limit: int):
+        super().__init__(f"Maximum sandbox recursion depth of {limit} exceeded")
+        self.limit = limit
+
+    def __reduce__(self):
+        # Rebuilt from the limit, not the message, when results are sent between grading processes
+        return type(self), (self.limit,)
+
+
+class MemoryLimitExceeded(SandboxError):
+
+    def __init__(self, limit: int):
+        super().__init__(f"Sandbox memory limit of {limit} bytes exceeded")
+        self.limit = limit
+
+    def __reduce__(self):
+        # Rebuilt from the limit, not the message, when results are sent between grading processes
+        return type(self), (self.limit,)
+
+
+class FuelExhausted(SandboxError):
+
+    def __init__(self):
+        super().__init__("Sandbox ran out of fuel")
+
+    def __reduce__(self):
+        return type(self), ()
@@ -0,0 +1,30 @@
+# Approximate sizes used to account for sandbox memory as frames are entered and left, without scanning the heap
+import sys
+
+from context.context import Context
+from value.value import Value, INT, NONE
+
+VALUE_SIZE = sys.getsizeof(NONE)
+POINTER_SIZE = 8
+FRAME_SIZE = sys.getsizeof(Context()) + sys.getsizeof([])
+
+
+def value_size(value: Value) -> int:
+    if value.tag == INT:
+        # Small ints are shared, but anything a submission builds up is charged by its real width
+        return VALUE_SIZE + sys.getsizeof(value.val)
+    return VALUE_SIZE
+
+
+def host_value_size(host) -> int:
+    # The same estimate for the plain ints, bools and None that translated code passes around
+    if type(host) is int:
+        return VALUE_SIZE + sys.getsizeof(host)
+    return VALUE_SIZE
+
+
+def frame_size(slots: list[Value]) -> int:
+    size = FRAME_SIZE + POINTER_SIZE * len(slots)
+    for v in slots:
+        size += value_size(v)
+    return size
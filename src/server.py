@@ -0,0 +1,163 @@
+# Long-running grader that keeps the parser and test modules loaded and serves grade requests over a unix socket.
+# Every request is one JSON line {"tests": <path>, "submission": <path>}, answered by one JSON line per test result
+# followed by a summary line {"done": true, ...}.
+# In fork mode the parent only preloads and warms up, then every request is graded in a short-lived forked child
+# that inherits the parser, its DFA cache and the loaded test modules without initializing them again.
+import argparse
+import gc
+import json
+import os
+import socketserver
+
+from context.context_stack import DEFAULT_RECURSION_LIMIT
+from batch import submissions
+from grading.grader import GradeReport, Grader, add_grader_arguments, import_frontend, load_syntax_tree
+
+# Seconds a connection may stay silent while a request is expected, or stop reading while it is answered
+DEFAULT_REQUEST_TIMEOUT = 5.0
+
+
+class GradingServer(socketserver.UnixStreamServer):
+    # Requests answered on one connection before it is closed, None for no limit
+    requests_per_connection: int | None = None
+
+    def __init__(self, socket_path: str, cache_dir: str | None = None, engine: str = "tree",
+                 recursion_limit: int = DEFAULT_RECURSION_LIMIT, fuel: int | None = None,
+                 memory_limit: int | None = None, results_dir: str | None = None, dedupe: bool = False,
+                 rename_locals: bool = False, request_timeout: float | None = DEFAULT_REQUEST_TIMEOUT):
+        self.cache_dir = cache_dir
+        self.engine = engine
+        self.recursion_limit = recursion_limit
+        self.fuel = fuel
+        self.memory_limit = memory_limit
+        self.results_dir = results_dir
+        self.dedupe = dedupe
+        self.rename_locals = rename_locals
+        self.request_timeout = request_timeout
+        # Loaded test files, reloaded when the file changes on disk
+        self.graders: dict[str, tuple[int, Grader]] = {}
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, GradingHandler)
+
+    def grader(self, test_file: str) -> Grader:
+        test_file = os.path.abspath(test_file)
+        modified = os.stat(test_file).st_mtime_ns
+        if (entry := self.graders.get(test_file)) is None or entry[0] != modified:
+            grader = Grader(test_file, self.cache_dir, self.engine, self.recursion_limit, self.fuel, self.memory_limit,
+                            self.results_dir, self.dedupe, self.rename_locals)
+            entry = self.graders[test_file] = (modified, grader)
+        return entry[1]
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+class ForkingGradingServer(socketserver.ForkingMixIn, GradingServer):
+    # A child is forked per connection, so a connection only gets one request: no two submissions share a child
+    requests_per_connection = 1
+
+
+class GradingHandler(socketserver.StreamRequestHandler):
+    server: GradingServer
+
+    def setup(self):
+        # Requests are served one at a time, a client that connects and then idles must not hold up the others
+        self.timeout = self.server.request_timeout
+        super().setup()
+
+    def send(self, message: dict):
+        self.wfile.write(json.dumps(message).encode() + b"\n")
+        self.wfile.flush()
+
+    def handle(self):
+        try:
+            self.serve_requests()
+        except TimeoutError:
+            # The client went quiet or stopped reading its results, it is dropped
+            pass
+
+    def serve_requests(self):
+        # A connection may send several requests, each is answered before the next one is read
+        served = 0
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            self.answer(line)
+            served += 1
+            if served == self.server.requests_per_connection:
+                return
+
+    def answer(self, line: bytes):
+        try:
+            request = json.loads(line)
+            grader = self.server.grader(request["tests"])
+            submission = request["submission"]
+        except Exception as e:
+            self.send({"done": True, **GradeReport(None, [], e).to_dict()})
+            return
+        report = GradeReport(submission, [])
+        try:
+            for r in grader.run_tests(submission):
+                report.results.append(r)
+                self.send(r.to_dict())
+        except Exception as e:
+            report.error = e
+        self.send({"done": True, **report.to_dict()})
+
+
+def warm_up(corpus: str):
+    # Parsing a corpus fills the parser's shared DFA cache, which every forked child then inherits
+    for f in submissions(corpus):
+        try:
+            load_syntax_tree(f)
+        except Exception:
+            pass
+
+
+def main(socket_path: str, cache_dir: str | None = None, engine: str = "tree",
+         recursion_limit: int = DEFAULT_RECURSION_LIMIT, fuel: int | None = None, memory_limit: int | None = None,
+         fork: bool = False, max_children: int | None = None, preload: list[str] | None = None,
+         warmup: str | None = None, results_dir: str | None = None, dedupe: bool = False, rename_locals: bool = False,
+         request_timeout: float | None = DEFAULT_REQUEST_TIMEOUT):
+    # Without fork requests are served one at a time, grading shares the tests modules and is not thread safe
+    server_class = ForkingGradingServer if fork else GradingServer
+    with server_class(socket_path, cache_dir, engine, recursion_limit, fuel, memory_limit, results_dir, dedupe,
+                      rename_locals, request_timeout) as server:
+        if max_children is not None:
+            server.max_children = max_children
+        if fork:
+            import_frontend()
+        for test_file in preload or []:
+            server.grader(test_file)
+        if warmup is not None:
+            warm_up(warmup)
+        if fork:
+            # Keeps everything loaded so far out of the collector, so children do not touch and copy its pages
+            gc.freeze()
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(usage="python3 server.py <Path to socket>")
+    arg_parser.add_argument("socket")
+    add_grader_arguments(arg_parser)
+    arg_parser.add_argument("--fork", action="store_true",
+                            help="grade every request in a forked child of a pre-warmed parent")
+    arg_parser.add_argument("--max-children", type=int, default=None,
+                            help="maximum number of forked children grading at once")
+    arg_parser.add_argument("--preload", action="append", default=[],
+                            help="test file loaded before serving, may be given more than once")
+    arg_parser.add_argument("--warmup", default=None,
+                            help="directory or manifest of sources parsed before serving to warm up the parser")
+    arg_parser.add_argument("--request-timeout", type=float, default=DEFAULT_REQUEST_TIMEOUT,
+                            help="seconds a client may stay silent or stop reading before it is disconnected")
+    args = arg_parser.parse_args()
+    main(args.socket, args.cache_dir, args.engine, args.recursion_limit, args.fuel, args.memory_limit, args.fork,
+         args.max_children, args.preload, args.warmup, args.results_dir, args.dedupe, args.rename_locals,
+         args.request_timeout)
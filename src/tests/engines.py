@@ -0,0 +1,121 @@
+# Runs the same programs on every engine and reports every run whose outcome differs from the tree walker's. The
+# outcome is what run() returns or the error it stops with, and the fuel and memory left afterwards, so the engines
+# have to agree on the limits as well as on the results.
+import argparse
+import copy
+import os
+import sys
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIR)
+
+from context.context import Context
+from context.context_stack import ContextStack, DEFAULT_RECURSION_LIMIT
+from grading.grader import ENGINES, parse
+from tree.optimizer import Optimizer
+from tree.resolver import Resolver
+from tree.statements import StatementList
+from value.bridge import Bridge
+
+PROGRAMS_DIR = os.path.join(SRC_DIR, "benchmarks", "programs")
+
+# Every program defines run(), like the benchmark programs it is run next to
+ENTRY_POINT = "run"
+REFERENCE_ENGINE = "tree"
+
+# Programs that stop early or recurse deeply, where the engines are most likely to part ways
+EDGE_CASES = {
+    "deep": "\n".join([
+        "def down(n):",
+        "    return 0 if n == 0 else down(n - 1) + 1",
+        "",
+        "",
+        "def run():",
+        "    return down(100)",
+    ]),
+    "guards": "\n".join([
+        "def pick(a, b):",
+        "    return a if not a == b or b == None and True else b + 1",
+        "",
+        "",
+        "def run():",
+        "    return pick(1, 1) + pick(2, 3) + (1 if pick(None, True) == None else 0)",
+    ]),
+    "unsupported": "\n".join([
+        "def pick(a, b):",
+        "    return a if b == True else b",
+        "",
+        "",
+        "def run():",
+        "    return pick(1, False) + pick(None, True)",
+    ]),
+    "closures": "\n".join([
+        "def outer(a, b):",
+        "    def inner(c):",
+        "        return a + c",
+        "    return inner(b) - inner(a)",
+        "",
+        "",
+        "def run():",
+        "    return outer(3, 40) + outer(100000000000000000000, 1)",
+    ]),
+}
+
+# (recursion limit, fuel, memory limit), from no limits to ones that stop most of the programs
+LIMITS = [
+    (DEFAULT_RECURSION_LIMIT, None, None),
+    (50, None, None),
+    (DEFAULT_RECURSION_LIMIT, 500, None),
+    (DEFAULT_RECURSION_LIMIT, None, 4000),
+    (DEFAULT_RECURSION_LIMIT, 100000, 100000),
+]
+
+
+def programs() -> dict[str, str]:
+    sources = {}
+    for n in sorted(os.listdir(PROGRAMS_DIR)):
+        if n.endswith(".py"):
+            with open(os.path.join(PROGRAMS_DIR, n), "r") as file:
+                sources[n[:-3]] = file.read()
+    sources.update(EDGE_CASES)
+    return sources
+
+
+def outcome(syntaxtree: StatementList, engine: str, limits: tuple[int, int | None, int | None]) -> tuple:
+    recursion_limit, fuel, memory_limit = limits
+    context = ContextStack([Context()], recursion_limit, fuel, memory_limit)
+    try:
+        ENGINES[engine](Resolver().resolve(Optimizer().optimize(syntaxtree)), context)
+        result = repr(Bridge(context).to_host(context.stack[0].defined_values[ENTRY_POINT])())
+    except Exception as e:
+        result = f"{type(e).__name__}: {e}"
+    return result, None if fuel is None else max(context.fuel, 0), context.memory_used
+
+
+def main(names: list[str] | None, engines: list[str]) -> bool:
+    mismatches = 0
+    runs = 0
+    for name, source in programs().items():
+        if names and name not in names:
+            continue
+        syntaxtree = parse(source)
+        for limits in LIMITS:
+            # Passes and engines change the tree they are given, so every run starts from its own copy
+            expected = outcome(copy.deepcopy(syntaxtree), REFERENCE_ENGINE, limits)
+            for engine in engines:
+                runs += 1
+                if (actual := outcome(copy.deepcopy(syntaxtree), engine, limits)) != expected:
+                    mismatches += 1
+                    print(f"{name} {engine} with limits {limits}: {actual} != {expected} ({REFERENCE_ENGINE})")
+    print(f"{runs} runs, {mismatches} mismatches")
+    return mismatches == 0
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(usage="python3 tests/engines.py [programs]")
+    arg_parser.add_argument("programs", nargs="*", help="programs to run, all of them by default")
+    arg_parser.add_argument("--engines", nargs="+", choices=ENGINES.keys(),
+                            default=[e for e in ENGINES.keys() if e != REFERENCE_ENGINE],
+                            help="engines compared against the tree walker")
+    args = arg_parser.parse_args()
+    sys.exit(0 if main(args.programs, args.engines) else 1)
@@ -1,4 +1,6 @@
-from context.context import ReturnValues
+from typing import Any, Mapping
+
+from context.context import EMPTY_VALUES
 from context.context_stack import ContextStack
 from tree.expression import Identifier
 from tree.statements import Statement, StatementList
@@ -12,15 +14,26 @@ class FuncDefinition(Statement):
         self.name = name
         self.arguments = arguments
         self.code = code
+        # Until the resolver has run every argument is also looked up by name
+        self.cells: list[tuple[str, int]] = [(a.name, i) for i, a in enumerate(arguments)]
+        self.named_locals = True
 
     def __str__(self):
         return "def " + str(self.name) + "(" + ", ".join(map(str, self.arguments)) + "):\n\t" + str(self.code).replace(
             "\n", "\n\t")
 
-    def execute_internal(self, context_stack: ContextStack) -> bool:
-        if not self.code.execute(context_stack):
-            context_stack.push(ReturnValues(Value(None, None)))
-        return False
+    def frame_values(self, arguments: list[Value]) -> Mapping[str, Any]:
+        if not self.named_locals:
+            return EMPTY_VALUES
+        return {name: arguments[slot] for name, slot in self.cells}
+
+    def call(self, context_stack: ContextStack, arguments: list[Value]) -> Value:
+        context_stack.enter(self.frame_values(arguments), arguments, self)
+        try:
+            self.code.execute(context_stack)
+        finally:
+            ret = context_stack.leave()
+        return ret
 
     def execute(self, context_stack: ContextStack) -> bool:
         context_stack.peek().defined_values[self.name.name] = Value("func", self)
@@ -1,11 +1,12 @@
 from abc import ABC, abstractmethod
 
-from context.context import Context, ReturnValues
 from context.context_stack import ContextStack
-from value.value import Value
+from value.value import Value, BOOL, INT, FUNC, NONE_TAG, NONE, TRUE, FALSE, int_value, bool_value
 
 
 class Expression(ABC):
+    # Source line the node starts on, set by the TreeVisitor
+    line: int | None = None
 
     @abstractmethod
     def __init__(self):
@@ -60,6 +61,8 @@ class StarExpression(UnaryExpression):
 
 
 class StarExpressions:
+    # Not an Expression, but located the same way for the profiler
+    line: int | None = None
 
     def __init__(self, exprs: list[StarExpression]):
         self.exprs = exprs
@@ -74,8 +77,7 @@ class OrExpression(BinaryExpression):
         return str(self.lhs) + " or " + str(self.rhs)
 
     def evaluate(self, context_stack: ContextStack) -> Value:
-        return Value("bool",
-                     self.lhs.evaluate(context_stack).is_truthy() or self.rhs.evaluate(context_stack).is_truthy())
+        return bool_value(self.lhs.evaluate(context_stack).is_truthy() or self.rhs.evaluate(context_stack).is_truthy())
 
 
 class AndExpression(BinaryExpression):
@@ -84,8 +86,7 @@ class AndExpression(BinaryExpression):
         return str(self.lhs) + " and " + str(self.rhs)
 
     def evaluate(self, context_stack: ContextStack) -> Value:
-        return Value("bool",
-                     self.lhs.evaluate(context_stack).is_truthy() and self.rhs.evaluate(context_stack).is_truthy())
+        return bool_value(self.lhs.evaluate(context_stack).is_truthy() and self.rhs.evaluate(context_stack).is_truthy())
 
 
 class NotExpression(UnaryExpression):
@@ -94,7 +95,7 @@ class NotExpression(UnaryExpression):
         return "not " + str(self.operand)
 
     def evaluate(self, context_stack: ContextStack) -> Value:
-        return Value("bool", not self.operand.evaluate(context_stack).is_truthy())
+        return bool_value(not self.operand.evaluate(context_stack).is_truthy())
 
 
 class BitOrExpression(BinaryExpression):
@@ -127,11 +128,48 @@ class ShlExpression(BinaryExpression):
         return str(self.lhs) + " << " + str(self.rhs)
 
 
+# Arithmetic and comparison nodes start out observing their operand types. Once they have seen them they rewrite
+# themselves into a specialized subclass with a cheap guard, and fall back to a generic subclass for good if it fails.
+
 class AddExpression(BinaryExpression):
 
     def __str__(self):
         return str(self.lhs) + " + " + str(self.rhs)
 
+    def evaluate(self, context_stack: ContextStack) -> Value:
+        lhs = self.lhs.evaluate(context_stack)
+        rhs = self.rhs.evaluate(context_stack)
+        if lhs.tag == INT and rhs.tag == INT:
+            self.__class__ = IntAddConstExpression if isinstance(self.rhs, ConstantExpression) else IntAddExpression
+            return int_value(lhs.val + rhs.val)
+        self.__class__ = GenericAddExpression
+        return lhs + rhs
+
+
+class IntAddExpression(AddExpression):
+
+    def evaluate(self, context_stack: ContextStack) -> Value:
+        lhs = self.lhs.evaluate(context_stack)
+        rhs = self.rhs.evaluate(context_stack)
+        if lhs.tag == INT and rhs.tag == INT:
+            return int_value(lhs.val + rhs.val)
+        self.__class__ = GenericAddExpression
+        return lhs + rhs
+
+
+class IntAddConstExpression(AddExpression):
+    # The right operand is an int constant, so only the left one is evaluated and checked
+
+    def evaluate(self, context_stack: ContextStack) -> Value:
+        lhs = self.lhs.evaluate(context_stack)
+        if lhs.tag == INT:
+            return int_value(lhs.val + self.rhs.value.val)
+        self.__class__ = GenericAddExpression
+        return lhs + self.rhs.value
+
+
+class GenericAddExpression(AddExpression):
+
     def evaluate(self, context_stack: ContextStack) -> Value:
         return self.lhs.evaluate(context_stack) + self.rhs.evaluate(context_stack)
 
@@ -141,6 +179,42 @@ class SubtractExpression(BinaryExpression):
     def __str__(self):
         return str(self.lhs) + " - " + str(self.rhs)
 
+    def evaluate(self, context_stack: ContextStack) -> Value:
+        lhs = self.lhs.evaluate(context_stack)
+        rhs = self.rhs.evaluate(context_stack)
+        if lhs.tag == INT and rhs.tag == INT:
+            if isinstance(self.rhs, ConstantExpression):
+                self.__class__ = IntSubtractConstExpression
+            else:
+                self.__class__ = IntSubtractExpression
+            return int_value(lhs.val - rhs.val)
+        self.__class__ = GenericSubtractExpression
+        return lhs - rhs
+
+
+class IntSubtractExpression(SubtractExpression):
+
+    def evaluate(self, context_stack: ContextStack) -> Value:
+        lhs = self.lhs.evaluate(context_stack)
+        rhs = self.rhs.evaluate(context_stack)
+        if lhs.tag == INT and rhs.tag == INT:
+            return int_value(lhs.val - rhs.val)
+        self.__class__ = GenericSubtractExpression
+        return lhs - rhs
+
+
+class IntSubtractConstExpression(SubtractExpression):
+
+    def evaluate(self, context_stack: ContextStack) -> Value:
+        lhs = self.lhs.evaluate(context_stack)
+        if lhs.tag == INT:
+            return int_value(lhs.val - self.rhs.value.val)
+        self.__class__ = GenericSubtractExpression
+        return lhs - self.rhs.value
+
+
+class GenericSubtractExpression(SubtractExpression):
+
     def evaluate(self, context_stack: ContextStack) -> Value:
         return self.lhs.evaluate(context_stack) - self.rhs.evaluate(context_stack)
 
@@ -208,7 +282,7 @@ class TrueLiteral(Expression):
         return "True"
 
     def evaluate(self, context_stack: ContextStack) -> Value:
-        return Value("bool", True)
+        return TRUE
 
 
 class FalseLiteral(Expression):
@@ -220,7 +294,7 @@ class FalseLiteral(Expression):
         return "False"
 
     def evaluate(self, context_stack: ContextStack) -> Value:
-        return Value("bool", False)
+        return FALSE
 
 
 class NoneLiteral(Expression):
@@ -232,7 +306,22 @@ class NoneLiteral(Expression):
         return "None"
 
     def evaluate(self, context_stack: ContextStack) -> Value:
-        return Value(None, None)
+        return NONE
+
+
+class ConstantExpression(Expression):
+
+    def __init__(self, value: Value):
+        super().__init__()
+        self.value = value
+
+    def __str__(self):
+        if self.value.tag == NONE_TAG:
+            return "None"
+        return str(self.value.val)
+
+    def evaluate(self, context_stack: ContextStack) -> Value:
+        return self.value
 
 
 class Identifier(Expression):
@@ -251,6 +340,35 @@ class Identifier(Expression):
         raise Exception(f"Attribute '{self.name}' Not Found! Call Stack:" + str(context_stack.stack[0].defined_values))
 
 
+class LocalIdentifier(Identifier):
+
+    def __init__(self, name: str, slot: int):
+        super().__init__(name)
+        self.slot = slot
+
+    def evaluate(self, context_stack: ContextStack) -> Value:
+        return context_stack.stack[-1].slots[self.slot]
+
+
+class GlobalIdentifier(Identifier):
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        # Inline cache, valid while the module's defined_values keeps the same version
+        self.cached_version = -1
+        self.cached_value = None
+
+    def evaluate(self, context_stack: ContextStack) -> Value:
+        values = context_stack.stack[0].defined_values
+        if values.version == self.cached_version:
+            return self.cached_value
+        if val := values.get(self.name):
+            self.cached_version = values.version
+            self.cached_value = val
+            return val
+        raise Exception(f"Attribute '{self.name}' Not Found! Call Stack:" + str(context_stack.stack[0].defined_values))
+
+
 class StringLiteral(Expression):
 
     def __init__(self, value: str):
@@ -271,7 +389,7 @@ class NumericLiteral(Expression):
         return str(self.value)
 
     def evaluate(self, context_stack: ContextStack) -> Value:
-        return Value("int", int(self.value))
+        return int_value(int(self.value))
 
 
 class EqComparison(BinaryExpression):
@@ -280,7 +398,56 @@ class EqComparison(BinaryExpression):
         return str(self.lhs) + " == " + str(self.rhs)
 
     def evaluate(self, context_stack: ContextStack) -> Value:
-        return Value("bool", self.lhs.evaluate(context_stack) == self.rhs.evaluate(context_stack))
+        lhs = self.lhs.evaluate(context_stack)
+        rhs = self.rhs.evaluate(context_stack)
+        if lhs.tag == rhs.tag:
+            if lhs.tag == INT:
+                self.__class__ = IntEqConstComparison if isinstance(self.rhs, ConstantExpression) else IntEqComparison
+            elif lhs.tag == BOOL:
+                self.__class__ = BoolEqComparison
+            else:
+                self.__class__ = GenericEqComparison
+            return TRUE if lhs.val == rhs.val else FALSE
+        self.__class__ = GenericEqComparison
+        return bool_value(lhs == rhs)
+
+
+class IntEqComparison(EqComparison):
+
+    def evaluate(self, context_stack: ContextStack) -> Value:
+        lhs = self.lhs.evaluate(context_stack)
+        rhs = self.rhs.evaluate(context_stack)
+        if lhs.tag == INT and rhs.tag == INT:
+            return TRUE if lhs.val == rhs.val else FALSE
+        self.__class__ = GenericEqComparison
+        return bool_value(lhs == rhs)
+
+
+class IntEqConstComparison(EqComparison):
+
+    def evaluate(self, context_stack: ContextStack) -> Value:
+        lhs = self.lhs.evaluate(context_stack)
+        if lhs.tag == INT:
+            return TRUE if lhs.val == self.rhs.value.val else FALSE
+        self.__class__ = GenericEqComparison
+        return bool_value(lhs == self.rhs.value)
+
+
+class BoolEqComparison(EqComparison):
+
+    def evaluate(self, context_stack: ContextStack) -> Value:
+        lhs = self.lhs.evaluate(context_stack)
+        rhs = self.rhs.evaluate(context_stack)
+        if lhs.tag == BOOL and rhs.tag == BOOL:
+            return TRUE if lhs.val == rhs.val else FALSE
+        self.__class__ = GenericEqComparison
+        return bool_value(lhs == rhs)
+
+
+class GenericEqComparison(EqComparison):
+
+    def evaluate(self, context_stack: ContextStack) -> Value:
+        return bool_value(self.lhs.evaluate(context_stack) == self.rhs.evaluate(context_stack))
 
 
 class NotEqComparison(BinaryExpression):
@@ -343,23 +510,18 @@ class CallExpression(Expression):
         super().__init__()
         self.name = name
         self.params = params
+        # Callee seen last time, which has already passed the type and arity checks
+        self.cached_callee = None
 
     def __str__(self):
         return str(self.name) + "(" + ", ".join(map(str, self.params)) + ")"
 
     def evaluate(self, context_stack: ContextStack) -> Value:
-        func: Value = self.name.evaluate(context_stack)
-        if func.ty != "func":
-            raise Exception("Cannot Call Non-Function!")
-        func = func.val
-        arguments = {}
-        if len(self.params) != len(func.arguments):
-            raise Exception("Too Many or Too Few Arguments")
-        for i in range(len(func.arguments)):
-            arguments[func.arguments[i].name] = self.params[i].evaluate(context_stack)
-
-        context_stack.push(Context(defined_values=arguments))
-        func.execute_internal(context_stack)
-        ret: ReturnValues = context_stack.pop()
-        context_stack.pop()
-        return ret.value
+        callee: Value = self.name.evaluate(context_stack)
+        if callee is not self.cached_callee:
+            if callee.tag != FUNC:
+                raise Exception("Cannot Call Non-Function!")
+            if len(self.params) != len(callee.val.arguments):
+                raise Exception("Too Many or Too Few Arguments")
+            self.cached_callee = callee
+        return callee.val.call(context_stack, [p.evaluate(context_stack) for p in self.params])
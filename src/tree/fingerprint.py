@@ -0,0 +1,82 @@
+# Fingerprints syntax trees so that submissions differing only in whitespace, comments and, optionally, the names of
+# their function locals are recognized as the same program. Meant for trees straight from the parser.
+import hashlib
+from typing import Iterator
+
+from tree.assignment_target import SingleAssignmentTarget
+from tree.definitions import FuncDefinition
+from tree.expression import Identifier, NumericLiteral, StringLiteral, ConstantExpression
+from tree.resolver import bound_names
+from tree.statements import AssignmentStatement
+from tree.traversal import Node, children, walk
+
+
+def assigned_name(node: AssignmentStatement) -> str:
+    return node.lhs.target.name if isinstance(node.lhs, SingleAssignmentTarget) else str(node.lhs)
+
+
+def normalize_number(value: str) -> str:
+    try:
+        return str(int(value))
+    except ValueError:
+        return value
+
+
+class Fingerprinter:
+
+    def __init__(self, rename_locals: bool):
+        self.rename_locals = rename_locals
+        self.scopes = 0
+
+    def local_names(self, func: FuncDefinition) -> list[str]:
+        # Arguments first, then the other locals in the order they first appear, so renaming is consistent
+        bound = bound_names(func.code)
+        names = [a.name for a in func.arguments]
+        for node in walk(func.code):
+            if isinstance(node, FuncDefinition):
+                name = node.name.name
+            elif isinstance(node, AssignmentStatement):
+                name = assigned_name(node)
+            elif isinstance(node, Identifier):
+                name = node.name
+            else:
+                continue
+            if name in bound and name not in names:
+                names.append(name)
+        return names
+
+    def tokens(self, node: Node, renames: dict[str, str]) -> Iterator[str]:
+        # Flattens the tree into the node types and the data they hold, children bracketed so the shape is kept
+        yield type(node).__name__
+        if isinstance(node, Identifier):
+            yield renames.get(node.name, node.name)
+        elif isinstance(node, NumericLiteral):
+            yield normalize_number(node.value)
+        elif isinstance(node, StringLiteral):
+            yield repr(node.value)
+        elif isinstance(node, ConstantExpression):
+            yield f"{node.value.tag}:{node.value.val!r}"
+        elif isinstance(node, AssignmentStatement):
+            name = assigned_name(node)
+            yield renames.get(name, name)
+        elif isinstance(node, FuncDefinition):
+            # The function's own name belongs to the enclosing scope, its arguments and locals to the new one
+            yield renames.get(node.name.name, node.name.name)
+            if self.rename_locals:
+                scope = self.scopes
+                self.scopes += 1
+                renames = renames | {n: f"${scope}.{i}" for i, n in enumerate(self.local_names(node))}
+            yield ",".join(renames.get(a.name, a.name) for a in node.arguments)
+        yield "("
+        for c in children(node):
+            yield from self.tokens(c, renames)
+        yield ")"
+
+
+def fingerprint(syntaxtree: Node, rename_locals: bool = False) -> str:
+    # Module level names are never renamed, the tests look them up by name
+    digest = hashlib.sha256()
+    for t in Fingerprinter(rename_locals).tokens(syntaxtree, {}):
+        digest.update(t.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
@@ -0,0 +1,63 @@
+# Pre-converts literals into shared Values, folds constant subexpressions and drops dead branches
+from context.context import Context
+from context.context_stack import ContextStack
+from tree.expression import BinaryExpression, UnaryExpression, TernaryExpression, ConstantExpression, \
+    NumericLiteral, TrueLiteral, FalseLiteral, NoneLiteral
+from tree.statements import Statement, StatementList, SimpleStatementList, IfStatement, ReturnStatement
+from tree.traversal import Node, children, replace_children
+from value.value import Value
+
+LITERALS = (NumericLiteral, TrueLiteral, FalseLiteral, NoneLiteral)
+
+
+class Optimizer:
+
+    def __init__(self):
+        self.constants: dict[tuple, Value] = {}
+        # Folded nodes only ever see constants, so they never touch this stack
+        self.scratch = ContextStack([Context()])
+
+    def optimize(self, syntaxtree: StatementList) -> StatementList:
+        return self.visit(syntaxtree)
+
+    def constant(self, value: Value) -> ConstantExpression:
+        return ConstantExpression(self.constants.setdefault((value.tag, value.val), value))
+
+    def fold(self, node: Node) -> Node:
+        try:
+            value = node.evaluate(self.scratch)
+        except Exception:
+            # Leave the node alone so the error is still raised if and when it is evaluated
+            return node
+        if not isinstance(value, Value):
+            return node
+        return self.constant(value)
+
+    def visit(self, node: Node) -> Node:
+        replace_children(node, self.visit)
+        if isinstance(node, (StatementList, SimpleStatementList)):
+            node.statements = self.prune(node.statements)
+        elif isinstance(node, LITERALS):
+            return self.fold(node)
+        elif isinstance(node, TernaryExpression) and isinstance(node.condition, ConstantExpression):
+            return node.lhs if node.condition.value.is_truthy() else node.rhs
+        elif isinstance(node, (BinaryExpression, UnaryExpression)):
+            if all(isinstance(c, ConstantExpression) for c in children(node)):
+                return self.fold(node)
+        return node
+
+    @staticmethod
+    def prune(statements: list[Statement]) -> list[Statement]:
+        pruned = []
+        for s in statements:
+            if isinstance(s, IfStatement) and isinstance(s.condition, ConstantExpression):
+                if s.condition.value.is_truthy():
+                    pruned += s.code.statements
+                    if any(isinstance(i, ReturnStatement) for i in s.code.statements):
+                        break
+                continue
+            pruned.append(s)
+            if isinstance(s, ReturnStatement):
+                # Anything after a return in the same block can never run
+                break
+        return pruned
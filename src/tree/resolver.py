@@ -0,0 +1,79 @@
+# Works out statically whether each name inside a function is a local, an enclosing or a module global
+from tree.assignment_target import SingleAssignmentTarget
+from tree.definitions import FuncDefinition
+from tree.expression import Identifier, LocalIdentifier, GlobalIdentifier
+from tree.statements import StatementList, SimpleStatementList, AssignmentStatement, IfStatement
+from tree.traversal import Node, children, replace_children
+
+
+def bound_names(node: Node) -> set[str]:
+    # Names bound directly in this scope, without descending into nested functions
+    if isinstance(node, FuncDefinition):
+        return {node.name.name}
+    if isinstance(node, AssignmentStatement) and isinstance(node.lhs, SingleAssignmentTarget):
+        return {node.lhs.target.name}
+    names = set()
+    if isinstance(node, (StatementList, SimpleStatementList, IfStatement)):
+        for c in children(node):
+            names |= bound_names(c)
+    return names
+
+
+def free_names(node: Node) -> set[str]:
+    # Names referenced by this node that are not bound inside of it
+    if isinstance(node, FuncDefinition):
+        return free_names(node.code) - bound_names(node.code) - {a.name for a in node.arguments}
+    if isinstance(node, Identifier):
+        return {node.name}
+    names = set()
+    for c in children(node):
+        names |= free_names(c)
+    return names
+
+
+def nested_functions(node: Node) -> list[FuncDefinition]:
+    # Functions defined directly in this scope, without descending into them
+    if isinstance(node, FuncDefinition):
+        return [node]
+    functions = []
+    for c in children(node):
+        functions += nested_functions(c)
+    return functions
+
+
+class Resolver:
+
+    def resolve(self, syntaxtree: StatementList) -> StatementList:
+        for func in nested_functions(syntaxtree):
+            self.resolve_function(func, set())
+        return syntaxtree
+
+    def resolve_function(self, func: FuncDefinition, enclosing: set[str]):
+        arguments = [a.name for a in func.arguments]
+        local_names = bound_names(func.code) | set(arguments)
+        nested = nested_functions(func.code)
+        captured = set()
+        for f in nested:
+            captured |= free_names(f) & local_names
+
+        # Arguments always live in slots, captured ones are also exposed by name so nested functions can see them
+        func.cells = [(name, slot) for slot, name in enumerate(arguments) if name in captured]
+        func.named_locals = bool(captured) or len(local_names) > len(arguments)
+        slots = {name: slot for slot, name in enumerate(arguments) if name not in captured}
+        dynamic = (local_names - slots.keys()) | enclosing
+
+        def rewrite(node: Node) -> Node:
+            if isinstance(node, FuncDefinition):
+                return node
+            if type(node) is Identifier:
+                if node.name in slots:
+                    return LocalIdentifier(node.name, slots[node.name])
+                if node.name not in dynamic:
+                    return GlobalIdentifier(node.name)
+                return node
+            replace_children(node, rewrite)
+            return node
+
+        replace_children(func, rewrite)
+        for f in nested:
+            self.resolve_function(f, enclosing | local_names)
@@ -1,12 +1,13 @@
 from abc import ABC, abstractmethod
 
-from context.context import ReturnValues
 from context.context_stack import ContextStack
 from tree.assignment_target import AssignmentTarget
 from tree.expression import Expression
 
 
 class Statement(ABC):
+    # Source line the node starts on, set by the TreeVisitor
+    line: int | None = None
 
     @abstractmethod
     def __init__(self):
@@ -43,6 +44,7 @@ class AssertStatement(Statement):
 
 
 class StatementList:
+    line: int | None = None
 
     def __init__(self, statents: list[Statement]):
         self.statements = statents
@@ -99,5 +101,5 @@ class ReturnStatement(Statement):
         return "return " + str(self.expr)
 
     def execute(self, context_stack: ContextStack) -> bool:
-        context_stack.push(ReturnValues(self.expr.evaluate(context_stack)))
+        context_stack.stack[-1].return_value = self.expr.evaluate(context_stack)
         return True
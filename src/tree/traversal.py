@@ -0,0 +1,74 @@
+# Generic helpers for passes that need to walk or rewrite syntax trees
+from typing import Callable
+
+from tree.definitions import FuncDefinition
+from tree.expression import Expression, BinaryExpression, UnaryExpression, TernaryExpression, StarExpressions, \
+    CallExpression
+from tree.statements import Statement, StatementList, SimpleStatementList, AssignmentStatement, AssertStatement, \
+    IfStatement, ReturnStatement
+
+Node = Statement | StatementList | Expression | StarExpressions
+
+
+def children(node: Node) -> list[Node]:
+    if isinstance(node, (StatementList, SimpleStatementList)):
+        return list(node.statements)
+    if isinstance(node, FuncDefinition):
+        return [node.code]
+    if isinstance(node, IfStatement):
+        return [node.condition, node.code]
+    if isinstance(node, ReturnStatement):
+        return [node.expr]
+    if isinstance(node, AssertStatement):
+        return list(node.expressions)
+    if isinstance(node, AssignmentStatement):
+        return [node.rhs] if node.rhs is not None else []
+    if isinstance(node, TernaryExpression):
+        return [node.lhs, node.rhs, node.condition]
+    if isinstance(node, BinaryExpression):
+        return [node.lhs, node.rhs]
+    if isinstance(node, UnaryExpression):
+        return [node.operand]
+    if isinstance(node, StarExpressions):
+        return list(node.exprs)
+    if isinstance(node, CallExpression):
+        return [node.name] + node.params
+    return []
+
+
+def replace_children(node: Node, replace: Callable[[Node], Node]):
+    # Replaces every direct child of node with replace(child), in place
+    if isinstance(node, (StatementList, SimpleStatementList)):
+        node.statements = [replace(s) for s in node.statements]
+    elif isinstance(node, FuncDefinition):
+        node.code = replace(node.code)
+    elif isinstance(node, IfStatement):
+        node.condition = replace(node.condition)
+        node.code = replace(node.code)
+    elif isinstance(node, ReturnStatement):
+        node.expr = replace(node.expr)
+    elif isinstance(node, AssertStatement):
+        node.expressions = [replace(e) for e in node.expressions]
+    elif isinstance(node, AssignmentStatement):
+        if node.rhs is not None:
+            node.rhs = replace(node.rhs)
+    elif isinstance(node, TernaryExpression):
+        node.lhs = replace(node.lhs)
+        node.rhs = replace(node.rhs)
+        node.condition = replace(node.condition)
+    elif isinstance(node, BinaryExpression):
+        node.lhs = replace(node.lhs)
+        node.rhs = replace(node.rhs)
+    elif isinstance(node, UnaryExpression):
+        node.operand = replace(node.operand)
+    elif isinstance(node, StarExpressions):
+        node.exprs = [replace(e) for e in node.exprs]
+    elif isinstance(node, CallExpression):
+        node.name = replace(node.name)
+        node.params = [replace(p) for p in node.params]
+
+
+def walk(node: Node):
+    yield node
+    for c in children(node):
+        yield from walk(c)
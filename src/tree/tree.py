@@ -15,6 +15,13 @@ from tree.statements import StatementList, SimpleStatementList, AssertStatement,
     ReturnStatement
 
 
+def located(node, ctx):
+    # Keeps the innermost line, nodes built by several visit methods are located by the first one
+    if node.line is None:
+        node.line = ctx.start.line
+    return node
+
+
 class TreeVisitor(PythonParserVisitor):
 
     def visitFile_input(self, ctx: PythonParser.File_inputContext):
@@ -27,13 +34,13 @@ class TreeVisitor(PythonParserVisitor):
         while statement := ctx.statement(i):
             statement_list.append(self.visitStatement(statement))
             i += 1
-        return StatementList(statement_list)
+        return located(StatementList(statement_list), ctx)
 
     def visitStatement(self, ctx: PythonParser.StatementContext):
         if simple := ctx.simple_stmts():
-            return self.visitSimple_stmts(simple)
+            return located(self.visitSimple_stmts(simple), ctx)
         if compound := ctx.compound_stmt():
-            return self.visitCompound_stmt(compound)
+            return located(self.visitCompound_stmt(compound), ctx)
 
     def visitCompound_stmt(self, ctx: PythonParser.Compound_stmtContext):
         if fdef := ctx.function_def():
@@ -46,7 +53,7 @@ class TreeVisitor(PythonParserVisitor):
     def visitIf_stmt(self, ctx: PythonParser.If_stmtContext):
         cond = self.visitNamed_expression(ctx.named_expression())
         code = self.visitBlock(ctx.block())
-        return IfStatement(cond, code)
+        return located(IfStatement(cond, code), ctx)
 
     def visitNamed_expression(self, ctx: PythonParser.Named_expressionContext):
         if expr := ctx.expression():
@@ -61,7 +68,7 @@ class TreeVisitor(PythonParserVisitor):
         name = ctx.NAME()
         params = self.visitParams(ctx.params())
         block = self.visitBlock(ctx.block())
-        return FuncDefinition(Identifier(name.getText()), params, block)
+        return located(FuncDefinition(Identifier(name.getText()), params, block), ctx)
 
     def visitBlock(self, ctx: PythonParser.BlockContext):
         return self.visitStatements(ctx.statements())
@@ -93,11 +100,11 @@ class TreeVisitor(PythonParserVisitor):
 
     def visitSimple_stmt(self, ctx: PythonParser.Simple_stmtContext):
         if assert_stmt := ctx.assert_stmt():
-            return self.visitAssert_stmt(assert_stmt)
+            return located(self.visitAssert_stmt(assert_stmt), ctx)
         if assign_stmt := ctx.assignment():
-            return self.visitAssignment(assign_stmt)
+            return located(self.visitAssignment(assign_stmt), ctx)
         if ret_stmt := ctx.return_stmt():
-            return self.visitReturn_stmt(ret_stmt)
+            return located(self.visitReturn_stmt(ret_stmt), ctx)
         else:
             raise Exception("Not Implemented yet")
 
@@ -166,7 +173,7 @@ class TreeVisitor(PythonParserVisitor):
         inner = ctx.star_expression()
         if len(inner) == 1:
             return self.visitStar_expression(inner[0])
-        return StarExpressions(list(map(lambda expr: self.visitStar_expression(expr), inner)))
+        return located(StarExpressions(list(map(lambda expr: self.visitStar_expression(expr), inner))), ctx)
 
     def visitStar_expression(self, ctx: PythonParser.Star_expressionContext):
         if expr := ctx.expression():
@@ -180,8 +187,8 @@ class TreeVisitor(PythonParserVisitor):
         if condition := ctx.disjunction(1):
             condition = self.visitDisjunction(condition)
             rhs = self.visitExpression(ctx.expression())
-            return TernaryExpression(lhs, rhs, condition)
-        return lhs
+            return located(TernaryExpression(lhs, rhs, condition), ctx)
+        return located(lhs, ctx)
 
     def visitDisjunction(self, ctx: PythonParser.DisjunctionContext):
         # top level is a logical or statement
@@ -333,7 +340,7 @@ class TreeVisitor(PythonParserVisitor):
                 args = ctx.arguments()
                 astargs = [] if args is None else self.visitArguments(args)
                 p = self.visitPrimary(p)
-                return CallExpression(p, astargs)
+                return located(CallExpression(p, astargs), ctx)
             raise Exception("Function calls / indexing is unimplemented")
         return self.visitAtom(ctx.atom())
 
@@ -0,0 +1,89 @@
+# Marshals values between host code, like test functions, and the sandbox.
+# Sandbox lists and tuples hold Values, dict keys and set members stay host values since Values are not hashable.
+from context.context_stack import ContextStack
+from value.value import Value, NONE_TAG, BOOL, INT, FLOAT, STR, LIST, DICT, SET, TUPLE, FUNC, NONE, new_value, \
+    int_value, bool_value
+
+# Host types that cross the boundary unchanged, in both directions
+SCALAR_TAGS = (NONE_TAG, BOOL, INT, FLOAT, STR)
+DIRECT_TYPES = (int, bool, type(None))
+
+
+class CallSite:
+    # Host callable standing in for one sandbox function, created once per function and reused for every call
+
+    def __init__(self, bridge: "Bridge", function: Value):
+        self.bridge = bridge
+        self.function = function
+        self.callee = function.val
+        self.name = self.callee.name.name
+        self.arity = len(self.callee.arguments)
+        # Engines that run on plain host values take them without a round trip through Value
+        self.call_host = getattr(self.callee, "call_host", None)
+
+    def __repr__(self):
+        return f"<sandbox function {self.name}>"
+
+    def __call__(self, *args):
+        if len(args) != self.arity:
+            raise Exception("Too Many or Too Few Arguments")
+        bridge = self.bridge
+        if self.call_host is not None and all(type(a) in DIRECT_TYPES for a in args):
+            result = self.call_host(bridge.context_stack, args)
+            return bridge.to_host(result) if type(result) is Value else result
+        return bridge.to_host(self.callee.call(bridge.context_stack, [bridge.to_value(a) for a in args]))
+
+
+class Bridge:
+
+    def __init__(self, context_stack: ContextStack):
+        self.context_stack = context_stack
+        # Keyed by the identity of the function implementation, which each call site keeps alive
+        self.call_sites: dict[int, CallSite] = {}
+
+    def call_site(self, function: Value) -> CallSite:
+        if (site := self.call_sites.get(id(function.val))) is None:
+            site = self.call_sites[id(function.val)] = CallSite(self, function)
+        return site
+
+    def to_value(self, host) -> Value:
+        ty = type(host)
+        if ty is int:
+            return int_value(host)
+        if ty is bool:
+            return bool_value(host)
+        if host is None:
+            return NONE
+        if ty is float:
+            return new_value(FLOAT, host)
+        if ty is str:
+            return new_value(STR, host)
+        if ty is list:
+            return new_value(LIST, [self.to_value(v) for v in host])
+        if ty is tuple:
+            return new_value(TUPLE, tuple(self.to_value(v) for v in host))
+        if ty is dict:
+            return new_value(DICT, {k: self.to_value(v) for k, v in host.items()})
+        if ty is set:
+            return new_value(SET, set(host))
+        if ty is CallSite:
+            return host.function
+        if ty is Value:
+            return host
+        raise Exception(f"Cannot pass a value of type '{ty.__name__}' into the sandbox")
+
+    def to_host(self, value: Value):
+        tag = value.tag
+        if tag in SCALAR_TAGS:
+            return value.val
+        if tag == FUNC:
+            return self.call_site(value)
+        if tag == LIST:
+            return [self.to_host(v) for v in value.val]
+        if tag == TUPLE:
+            return tuple(self.to_host(v) for v in value.val)
+        if tag == DICT:
+            return {k: self.to_host(v) for k, v in value.val.items()}
+        if tag == SET:
+            return set(value.val)
+        raise Exception(f"Cannot pass a value of type '{value.ty}' out of the sandbox")
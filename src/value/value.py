@@ -1,37 +1,74 @@
-import tree
+# Type tags, compared as ints instead of strings on every operation
+NONE_TAG = 0
+BOOL = 1
+INT = 2
+FLOAT = 3
+STR = 4
+LIST = 5
+DICT = 6
+SET = 7
+TUPLE = 8
+FUNC = 9
 
-global_context = None
+TYPE_NAMES = [None, "bool", "int", "float", "str", "list", "dict", "set", "tuple", "func"]
+TAGS = {name: tag for tag, name in enumerate(TYPE_NAMES)}
 
 
 class Value:
+    __slots__ = ("tag", "val")
 
     def __init__(self, ty: str | None, val: None | str | bool | int | float | list | dict | set | tuple):
-        self.ty = ty
+        self.tag = TAGS[ty]
         self.val = val
 
+    @property
+    def ty(self) -> str | None:
+        return TYPE_NAMES[self.tag]
+
     def __str__(self):
         return "Value(type: '" + str(self.ty) + "', value: " + str(self.val) + ")"
 
-    def __call__(self, *args, **kwargs):
-        if self.ty == "func":
-            arguments = list(map(lambda v: tree.expression.NumericLiteral(v), args))
-            call = tree.expression.CallExpression(self.val.name, arguments)
-            return call.evaluate(global_context).val
-        else:
-            raise Exception("Cannot Call Non-Function")
-
-    def is_truthy(self):
-        return self.ty == "bool" and self.val and self.ty is not None
+    def is_truthy(self) -> bool:
+        return self.tag == BOOL and self.val
 
     def __eq__(self, other):
-        return self.ty == other.ty and self.val == other.val
+        return self.tag == other.tag and self.val == other.val
 
     def __add__(self, other):
-        if self.ty == "int" and other.ty == "int":
-            return Value("int", self.val + other.val)
+        if self.tag == INT and other.tag == INT:
+            return int_value(self.val + other.val)
         else:
             raise Exception("Unimplemented")
 
     def __sub__(self, other):
-        if self.ty == "int" and other.ty == "int":
-            return Value("int", self.val - other.val)
+        if self.tag == INT and other.tag == INT:
+            return int_value(self.val - other.val)
+        else:
+            raise Exception("Unimplemented")
+
+
+def new_value(tag: int, val) -> Value:
+    # Skips the type name lookup in Value.__init__ for callers that already have a tag
+    value = Value.__new__(Value)
+    value.tag = tag
+    value.val = val
+    return value
+
+
+NONE = new_value(NONE_TAG, None)
+TRUE = new_value(BOOL, True)
+FALSE = new_value(BOOL, False)
+
+SMALL_INT_MIN = -5
+SMALL_INT_MAX = 256
+SMALL_INTS = [new_value(INT, i) for i in range(SMALL_INT_MIN, SMALL_INT_MAX + 1)]
+
+
+def int_value(val: int) -> Value:
+    if SMALL_INT_MIN <= val <= SMALL_INT_MAX:
+        return SMALL_INTS[val - SMALL_INT_MIN]
+    return new_value(INT, val)
+
+
+def bool_value(val: bool) -> Value:
+    return TRUE if val else FALSE